@@ -0,0 +1,69 @@
+"""Speech recognition backends.
+
+A transcriber turns 16 kHz mono float32 audio into segments of the form
+``{"start": seconds, "end": seconds, "text": str}``, timed from the start of
+the audio it was given. The pipeline gets its transcriber from the model
+registry, configured by ``settings.INFERENCE_MODELS["asr"]``:
+
+* ``"whisper"`` runs the reference PyTorch Whisper.
+* ``"faster-whisper"`` runs Whisper on CTranslate2, which with
+  ``"compute_type": "int8"`` is several times faster on CPU for a small loss
+  in accuracy. Needs the ``faster-whisper`` extra.
+"""
+
+import contextlib
+from collections.abc import Iterator
+from typing import Any, Protocol
+
+import numpy as np
+
+
+class Transcriber(Protocol):
+    def transcribe(self, audio: np.ndarray) -> Iterator[dict]: ...
+
+
+class WhisperTranscriber:
+    def __init__(self, config: dict[str, Any]):
+        import whisper
+
+        self.device = config.get("device") or "cpu"
+        self.model = whisper.load_model(config.get("size", "tiny"), device=self.device)
+
+    def transcribe(self, audio: np.ndarray) -> Iterator[dict]:
+        with contextlib.redirect_stdout(None):
+            result = self.model.transcribe(audio, fp16=self.device != "cpu")
+        for segment in result["segments"]:
+            yield {
+                "start": segment["start"],
+                "end": segment["end"],
+                "text": segment["text"].strip(),
+            }
+
+
+class FasterWhisperTranscriber:
+    def __init__(self, config: dict[str, Any]):
+        from faster_whisper import WhisperModel
+
+        self.beam_size = config.get("beam_size", 1)
+        self.language = config.get("language")
+        self.model = WhisperModel(
+            config.get("size", "tiny"),
+            device=config.get("device") or "cpu",
+            compute_type=config.get("compute_type", "int8"),
+            cpu_threads=config.get("threads") or 0,
+        )
+
+    def transcribe(self, audio: np.ndarray) -> Iterator[dict]:
+        # Segments are decoded lazily, so each one is yielded as soon as it
+        # has been transcribed.
+        segments, _ = self.model.transcribe(
+            audio, beam_size=self.beam_size, language=self.language
+        )
+        for segment in segments:
+            yield {"start": segment.start, "end": segment.end, "text": segment.text.strip()}
+
+
+BACKENDS = {
+    "whisper": WhisperTranscriber,
+    "faster-whisper": FasterWhisperTranscriber,
+}
@@ -0,0 +1,174 @@
+"""Decode audio straight into memory for transcription."""
+
+import subprocess
+
+import numpy as np
+from moviepy.config import FFMPEG_BINARY
+
+# Whisper (and most speech models) expect 16 kHz mono.
+SAMPLE_RATE = 16_000
+
+
+def decode_audio(path: str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Decode the audio track of ``path`` into a mono float32 array.
+
+    ffmpeg resamples and writes raw samples to a pipe, so nothing touches the
+    disk. A file without an audio track gives an empty array.
+    """
+    cmd = [
+        FFMPEG_BINARY,
+        "-nostdin",
+        "-threads", "0",
+        "-i", path,
+        "-vn",
+        "-f", "f32le",
+        "-acodec", "pcm_f32le",
+        "-ac", "1",
+        "-ar", str(sample_rate),
+        "-",
+    ]
+    process = subprocess.run(cmd, capture_output=True)
+    if process.returncode != 0:
+        stderr = process.stderr.decode(errors="replace")
+        if "does not contain any stream" in stderr:
+            return np.zeros(0, dtype=np.float32)
+        raise RuntimeError(f"Failed to decode audio from {path}: {stderr.strip()}")
+    # torch warns about (and can't share) read-only buffers, so take a copy.
+    return np.frombuffer(process.stdout, dtype=np.float32).copy()
+
+
+def _runs(mask: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Start and end (exclusive) indices of each run of True in ``mask``."""
+    edges = np.flatnonzero(np.diff(mask.astype(np.int8), prepend=0, append=0))
+    return edges[::2], edges[1::2]
+
+
+def _moving_std(values: np.ndarray, width: int) -> np.ndarray:
+    """Standard deviation of ``values`` over a window of ``width`` centred on each."""
+    width |= 1
+    kernel = np.ones(width) / width
+    padded = np.pad(values, width // 2, mode="edge")
+    mean = np.convolve(padded, kernel, mode="valid")
+    square = np.convolve(padded**2, kernel, mode="valid")
+    return np.sqrt(np.maximum(square - mean**2, 0))
+
+
+def _moving_median(values: np.ndarray, width: int) -> np.ndarray:
+    """Median of ``values`` over a window of ``width`` centred on each."""
+    width |= 1
+    padded = np.pad(values, width // 2, mode="edge")
+    return np.median(np.lib.stride_tricks.sliding_window_view(padded, width), axis=1)
+
+
+def speech_regions(
+    audio: np.ndarray,
+    sample_rate: int = SAMPLE_RATE,
+    frame_ms: int = 30,
+    min_level_db: float = -45.0,
+    quiet_floor_db: float = -50.0,
+    noise_margin_db: float = 6.0,
+    modulation_ms: int = 1000,
+    min_modulation_db: float = 1.5,
+    min_speech_ms: int = 250,
+    padding_ms: int = 300,
+    max_gap_ms: int = 1500,
+) -> list[tuple[int, int]]:
+    """Find the stretches of ``audio`` that may contain speech.
+
+    A cheap energy detector: a frame counts as voiced when it is louder than
+    ``min_level_db``. The track's noise floor (its quietest tenth) only
+    raises that threshold, to ``noise_margin_db`` above it, when the floor is
+    quieter than ``quiet_floor_db``, i.e. when the track really has silent
+    stretches. A louder floor is background music or speech that never
+    stops, and comparing against it would throw the speech away.
+
+    Loudness alone can't tell speech from music, so a voiced frame must also
+    be modulated like speech: the standard deviation of the level over
+    ``modulation_ms`` windows, as a median over twice that around the frame,
+    has to reach ``min_modulation_db``. Syllables and the pauses between
+    them make speech swing by 10 dB or more, and still by a few dB over a
+    music bed, while held notes barely move and the median ignores the odd
+    chord change. Music with sharp attacks can pass as speech, which only
+    costs transcription time.
+
+    Voiced runs (bridging dips shorter than ``padding_ms``) shorter than
+    ``min_speech_ms`` are discarded, the rest are widened by ``padding_ms``
+    to keep word onsets and tails, and regions closer than ``max_gap_ms``
+    are merged. Returns ``(start, end)`` sample offsets into ``audio``.
+    """
+    frame = max(1, sample_rate * frame_ms // 1000)
+    count = len(audio) // frame
+    if count == 0:
+        return []
+
+    frames = audio[: count * frame].reshape(count, frame)
+    level = 10 * np.log10(np.mean(np.square(frames, dtype=np.float64), axis=1) + 1e-10)
+    if level.max() <= quiet_floor_db:
+        return []
+    threshold = min_level_db
+    floor = np.percentile(level, 10)
+    if floor <= quiet_floor_db:
+        threshold = max(threshold, floor + noise_margin_db)
+    window = modulation_ms // frame_ms
+    modulation = _moving_median(_moving_std(level, window), 2 * window)
+    starts, ends = _runs((level > threshold) & (modulation >= min_modulation_db))
+
+    # Dips between syllables shorter than the padding don't split a run.
+    padding = padding_ms // frame_ms
+    if len(starts):
+        split = starts[1:] - ends[:-1] > padding
+        starts, ends = starts[np.r_[True, split]], ends[np.r_[split, True]]
+    long_enough = (ends - starts) * frame_ms >= min_speech_ms
+    starts = np.maximum(starts[long_enough] - padding, 0)
+    ends = np.minimum(ends[long_enough] + padding, count)
+
+    regions: list[tuple[int, int]] = []
+    max_gap = max_gap_ms // frame_ms
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        if regions and start - regions[-1][1] <= max_gap:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    # The last region runs to the end of the audio rather than of its last
+    # whole frame.
+    return [
+        (start * frame, len(audio) if end == count else end * frame)
+        for start, end in regions
+    ]
+
+
+class JoinedRegions:
+    """Regions of a track joined into one buffer, as faster-whisper's VAD does.
+
+    Transcribing the joined buffer costs one model call per chunk instead of
+    at least one per region; :meth:`track_time` maps times in the buffer back
+    to times in the original track.
+    """
+
+    def __init__(
+        self,
+        audio: np.ndarray,
+        regions: list[tuple[int, int]],
+        sample_rate: int = SAMPLE_RATE,
+    ):
+        self.sample_rate = sample_rate
+        self.audio = np.concatenate(
+            [audio[start:end] for start, end in regions] or [audio[:0]]
+        )
+        lengths = np.array([end - start for start, end in regions], dtype=np.int64)
+        # Where each region starts in the buffer and in the track.
+        self._joined = np.cumsum(lengths) - lengths
+        self._track = np.array([start for start, _ in regions], dtype=np.int64)
+
+    def track_time(self, seconds: float, end: bool = False) -> float:
+        """Map ``seconds`` into the buffer to seconds into the track.
+
+        A time on the seam between two regions is the start of the later one,
+        or, with ``end``, the end of the earlier one.
+        """
+        if not len(self._joined):
+            return seconds
+        sample = seconds * self.sample_rate
+        region = np.searchsorted(self._joined, sample, side="left" if end else "right") - 1
+        region = max(int(region), 0)
+        return (self._track[region] + sample - self._joined[region]) / self.sample_rate
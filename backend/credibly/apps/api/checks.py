@@ -0,0 +1,40 @@
+"""System checks for settings the pipeline relies on across processes."""
+
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def check_channel_layer(app_configs, **kwargs):
+    backend = settings.CHANNEL_LAYERS.get("default", {}).get("BACKEND", "")
+    if backend.endswith("InMemoryChannelLayer"):
+        return [
+            Warning(
+                "The default channel layer only lives in this process.",
+                hint=(
+                    "Pipeline events are published from Celery workers, so "
+                    "WebSocket and Socket.IO clients never receive them. Use "
+                    "channels_redis.core.RedisChannelLayer."
+                ),
+                id="api.W001",
+            )
+        ]
+    return []
+
+
+@register()
+def check_default_cache(app_configs, **kwargs):
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if backend.endswith(("LocMemCache", "DummyCache")):
+        return [
+            Warning(
+                "The default cache is not shared between processes.",
+                hint=(
+                    "Analysis job claims and running scores are taken in the "
+                    "web process and released in Celery workers, so a "
+                    "per-process cache never releases them. Use a Redis cache."
+                ),
+                id="api.W002",
+            )
+        ]
+    return []
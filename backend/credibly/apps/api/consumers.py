@@ -1,22 +1,11 @@
-import contextlib
-import os
-import tempfile
-from collections.abc import Iterator
+import json
+from collections import Counter
 
+from asgiref.sync import async_to_sync
 from channels.generic.websocket import JsonWebsocketConsumer, WebsocketConsumer
-from textblob import TextBlob
-from rest_framework.renderers import JSONRenderer
-import whisper
-import moviepy
-import yt_dlp
-import easyocr
-import cv2
 
-from .models import BiasedContent, BiasedMedia
-from .serializers import BiasedContentSerializer, BiasedMediaSerializer
-
-reader = easyocr.Reader(["en"])
-audio_model = whisper.load_model("tiny")
+from . import notify, payload_cache, payloads, scheduler
+from .tasks import analyze_media
 
 
 class Credibility(WebsocketConsumer):
@@ -24,75 +13,83 @@ class Credibility(WebsocketConsumer):
         url_kw = self.scope["url_route"]["kwargs"]
         self.name = url_kw["name"]
         self.url = url_kw["url"]
+        self.group = notify.group_for(self.url)
+        # Contents already streamed to the client, so they aren't repeated
+        # when the final result arrives.
+        self.sent = Counter()
         self.accept()
 
-        media = BiasedMedia.objects.filter(url=self.url).first()
-        if media is not None and media.complete:
-            media_content: Iterator[BiasedContent] = media.biased_content.all()
-        else:
-            audio_text = None
-            video_text = {}
-
-            video_id = self.url[self.url.index("video/") + 6 :]
-            print("Starting video processing")
-            video_id = yt_dlp.YoutubeDL().extract_info(self.url)["id"]
-            temp_video = os.path.join(tempfile.gettempdir(), video_id) + ".mp4"
-
-            with yt_dlp.YoutubeDL({"outtmpl": temp_video}) as ydl:
-                ydl.extract_info(self.url, download=True)
-
-            print("Extracted video info")
-            encoded_video = moviepy.VideoFileClip(temp_video)
-            temp_audio = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
-            encoded_video.audio.write_audiofile(temp_audio.name)
-
-            print("Transcribing")
-            with contextlib.redirect_stdout(None):
-                transcribed_audio = audio_model.transcribe(temp_audio.name)
+        # Join before checking the database so a result published in between
+        # isn't missed.
+        async_to_sync(self.channel_layer.group_add)(self.group, self.channel_name)
 
-                lines = []
-
-                for segment in transcribed_audio["segments"]:
-                    lines.append(f"{segment["start"]}-{segment["end"]}: {segment['text'].strip()}")
-
-                audio_text = "\n".join(lines)
-
-                for t in range(0, encoded_video.n_frames, int(encoded_video.fps)):
-                    frame = encoded_video.get_frame(t)
-                    frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-
-                    results = reader.readtext(frame, detail=0)
-                    if results:
-                        video_text[t / int(encoded_video.fps)] = results
+        entry = payload_cache.get_completed(self.url)
+        if entry is not None:
+            self.send_contents(entry["media"]["biased_content"])
+            self.close(reason="video processing complete")
+            return
 
-                video_text = "\n".join(
-                    [f"{time}: {line}" for time, line in video_text.items()]
+        analyze_media(self.url, self.name)
+        position = scheduler.queue_position(self.url)
+        if position is not None:
+            self.send(
+                text_data=json.dumps(
+                    {"event": "queued", "url": self.url, "position": position}
                 )
+            )
+
+    def disconnect(self, code):
+        async_to_sync(self.channel_layer.group_discard)(self.group, self.channel_name)
+
+    def send_contents(self, contents):
+        for content in contents:
+            if self.sent[content["content"]] > 0:
+                self.sent[content["content"]] -= 1
+                continue
+            self.send(bytes_data=payloads.dumps(content))
+
+    def media_event(self, message):
+        event, data = message["event"], message["data"]
+        if event == "content":
+            self.send(bytes_data=payloads.dumps(data))
+            self.sent[data["content"]] += 1
+        elif event == "result":
+            self.send_contents(data["contents"])
+            self.close(reason="video processing complete")
+        elif event == "error":
+            self.send(text_data=json.dumps({"event": event, **data}))
+            self.close(reason="video processing failed")
+        else:
+            self.send(text_data=json.dumps({"event": event, **data}))
 
-            if media is None:
-                media = BiasedMedia.objects.create(url=self.url, name=self.name)
-            media_content = self.bias_from_text(audio_text, media)
-
-            temp_audio.close()
-            os.remove(temp_video)
-
-        print("FOUND MEDIA CONTENT YIPEEEEEEEEEEEE")
-
-        for content in media_content:
-            ser = BiasedContentSerializer(content)
-            print(ser.data)
-            self.send(bytes_data=JSONRenderer().render(ser.data))
-        media.complete = True
-        media.save()
 
-        self.close(reason="video processing complete")
+class GeneralInfo(JsonWebsocketConsumer):
+    def connect(self):
+        self.media_groups = set()
+        self.accept()
 
+    def disconnect(self, code):
+        for group in self.media_groups:
+            async_to_sync(self.channel_layer.group_discard)(group, self.channel_name)
 
-class GeneralInfo(JsonWebsocketConsumer):
     def receive_json(self, json_data):
         data = json_data.get("url")
         if data is None:
             return
-        media = BiasedMedia.objects.get(url=data)
-        ser = BiasedMediaSerializer(media)
-        self.send_json(JSONRenderer().render(ser.data))
+        # Keep the client posted on fact-check verdicts for this media.
+        group = notify.group_for(data)
+        if group not in self.media_groups:
+            async_to_sync(self.channel_layer.group_add)(group, self.channel_name)
+            self.media_groups.add(group)
+        entry = payload_cache.get_completed(data)
+        if entry is not None:
+            payload = entry["media"]
+        else:
+            payload = payloads.media_payload_for_url(data)
+        if payload is None:
+            self.send_json({"error": "Unknown media", "url": data})
+            return
+        self.send(text_data=payloads.dumps(payload).decode())
+
+    def media_event(self, message):
+        self.send_json({"event": message["event"], **message["data"]})
@@ -0,0 +1,341 @@
+"""Fact-checking statements with Gemini.
+
+One :class:`FactChecker` is shared per process. It reuses a single client,
+packs several statements into each prompt, caps how many requests are in
+flight, rate limits them with a token bucket and retries transient failures
+with exponential backoff. Point ``FACT_CHECK["base_url"]`` at a local server
+to run against a fake endpoint.
+
+Verdicts are cached in ``FactCheckVerdict`` by the hash of the normalized
+claim, so a claim repeated across videos is only ever sent to the model once
+per ``FACT_CHECK["verdict_ttl"]`` and model/prompt version.
+"""
+
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from typing import Annotated
+
+import pydantic
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from google import genai
+from google.genai import errors, types
+from pydantic import Field, TypeAdapter
+from pydantic_core import from_json
+
+from . import payload_cache, writer
+from .models import BiasedContent, BiasedMedia, FactCheckVerdict
+
+logger = logging.getLogger(__name__)
+
+
+type zero_to_one = Annotated[float, Field(ge=0, le=1)]
+
+
+class CheckBSResponse(pydantic.BaseModel):
+    misinformation_amount: zero_to_one
+    certainity: zero_to_one
+
+
+class IndexedCheckBSResponse(CheckBSResponse):
+    index: int
+
+
+_batch_response = TypeAdapter(list[IndexedCheckBSResponse])
+_verdict = TypeAdapter(IndexedCheckBSResponse)
+
+
+class TokenBucket:
+    """Blocking token bucket allowing ``rate`` acquisitions per second."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, errors.ServerError):
+        return True
+    if isinstance(exc, errors.ClientError):
+        return exc.code == 429
+    # The model occasionally answers with malformed or truncated JSON.
+    return isinstance(exc, (pydantic.ValidationError, ValueError))
+
+
+def build_prompt(statements: list[str]) -> str:
+    numbered = "\n".join(f"{i}: {statement!r}" for i, statement in enumerate(statements))
+    return (
+        "For each input statement, estimate the amount of misinformation in it "
+        "and how certain you are in that decision, both on a scale of 0 to 1.\n"
+        "Respond with a JSON array holding one object per statement, where "
+        '"index" is the number of the statement it refers to.\n'
+        f"The output should strictly follow the JSON schema: {_batch_response.json_schema()}\n"
+        f"The input statements are:\n{numbered}\n"
+        "Please provide the output strictly in JSON format, and do not include any additional information or analysis."
+    )
+
+
+def parse_response(text: str, count: int) -> list[CheckBSResponse | None]:
+    """Map the verdicts in a batch response back to their statements.
+
+    A reply cut off part way through keeps the verdicts that arrived whole;
+    one with no usable verdict at all raises, so the batch is retried.
+    """
+    text = text.strip().strip("`").removeprefix("json")
+    items = from_json(text, allow_partial=True)
+    if not isinstance(items, list):
+        raise ValueError(f"Expected a JSON array, got {type(items).__name__}")
+    parsed = []
+    for item in items:
+        try:
+            parsed.append(_verdict.validate_python(item))
+        except pydantic.ValidationError:
+            continue
+    if items and not parsed:
+        raise ValueError("No valid verdict in the response")
+    verdicts: list[CheckBSResponse | None] = [None] * count
+    for item in parsed:
+        if 0 <= item.index < count:
+            verdicts[item.index] = CheckBSResponse(
+                misinformation_amount=item.misinformation_amount,
+                certainity=item.certainity,
+            )
+    return verdicts
+
+
+class FactChecker:
+    def __init__(self, options: dict | None = None, client: genai.Client | None = None):
+        self.options = dict(settings.FACT_CHECK if options is None else options)
+        self._client = client
+        self._client_lock = threading.Lock()
+        self.semaphore = threading.BoundedSemaphore(self.options["max_concurrency"])
+        self.bucket = TokenBucket(
+            self.options["requests_per_minute"] / 60, self.options["burst"]
+        )
+
+    @property
+    def client(self) -> genai.Client:
+        # Batches start on several threads at once; a client built twice would
+        # have the loser closed under whichever thread is using it.
+        with self._client_lock:
+            if self._client is None:
+                http_options = None
+                if self.options.get("base_url"):
+                    http_options = types.HttpOptions(base_url=self.options["base_url"])
+                self._client = genai.Client(
+                    api_key=self.options["api_key"], http_options=http_options
+                )
+            return self._client
+
+    def _generate(self, prompt: str) -> str:
+        response = self.client.models.generate_content(
+            model=self.options["model"],
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                tools=[types.Tool(google_search=types.GoogleSearch())],
+            ),
+        )
+        text = response.text
+        if text is None:
+            raise ValueError(f"Gemini returned no text: {response}")
+        return text
+
+    def _check_batch(self, statements: list[str]) -> list[CheckBSResponse | None]:
+        prompt = build_prompt(statements)
+        attempts = self.options["max_retries"] + 1
+        for attempt in range(attempts):
+            try:
+                with self.semaphore:
+                    self.bucket.acquire()
+                    text = self._generate(prompt)
+                return parse_response(text, len(statements))
+            except Exception as exc:
+                if attempt + 1 == attempts or not _is_retryable(exc):
+                    logger.warning("Fact-check batch failed: %s", exc)
+                    return [None] * len(statements)
+                delay = self.options["backoff"] * 2**attempt
+                time.sleep(delay + random.uniform(0, delay))
+        return [None] * len(statements)
+
+    def check(
+        self,
+        statements: list[str],
+        on_batch: Callable[[int, list[CheckBSResponse | None]], None] | None = None,
+    ) -> list[CheckBSResponse | None]:
+        """Fact-check ``statements``, returning a verdict (or None) for each.
+
+        ``on_batch`` is called from this thread with the index of a batch's
+        first statement and its verdicts as each batch finishes.
+        """
+        size = self.options["batch_size"]
+        verdicts: list[CheckBSResponse | None] = [None] * len(statements)
+        if not statements:
+            return verdicts
+        with ThreadPoolExecutor(self.options["max_concurrency"]) as executor:
+            futures = {
+                executor.submit(self._check_batch, statements[start : start + size]): start
+                for start in range(0, len(statements), size)
+            }
+            for future in as_completed(futures):
+                start, results = futures[future], future.result()
+                verdicts[start : start + len(results)] = results
+                if on_batch is not None:
+                    on_batch(start, results)
+        return verdicts
+
+
+_checker: FactChecker | None = None
+_checker_lock = threading.Lock()
+
+
+def get_checker() -> FactChecker:
+    global _checker
+    with _checker_lock:
+        if _checker is None:
+            _checker = FactChecker()
+        return _checker
+
+
+# Bump when the prompt changes in a way that should invalidate old verdicts.
+PROMPT_VERSION = 2
+
+
+def verdict_tag() -> str:
+    return f"{settings.FACT_CHECK['model']}/v{PROMPT_VERSION}"
+
+
+def normalize_claim(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+def claim_hash(text: str) -> str:
+    return hashlib.sha256(normalize_claim(text).encode()).hexdigest()
+
+
+def cached_verdicts(hashes: Iterable[str]) -> dict[str, CheckBSResponse]:
+    """Look up unexpired verdicts from the current model for ``hashes``."""
+    cutoff = timezone.now() - timedelta(seconds=settings.FACT_CHECK["verdict_ttl"])
+    verdicts = FactCheckVerdict.objects.filter(
+        claim_hash__in=set(hashes), model=verdict_tag(), checked_at__gte=cutoff
+    )
+    return {
+        verdict.claim_hash: CheckBSResponse(
+            misinformation_amount=verdict.misinformation_amount,
+            certainity=verdict.certainty,
+        )
+        for verdict in verdicts
+    }
+
+
+def store_verdicts(verdicts: dict[str, tuple[str, CheckBSResponse]]) -> None:
+    """Save ``{hash: (claim, verdict)}``, replacing older verdicts."""
+    if not verdicts:
+        return
+    FactCheckVerdict.objects.bulk_create(
+        [
+            FactCheckVerdict(
+                claim_hash=digest,
+                claim=claim,
+                misinformation_amount=verdict.misinformation_amount,
+                certainty=verdict.certainity,
+                model=verdict_tag(),
+            )
+            for digest, (claim, verdict) in verdicts.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["claim_hash"],
+        update_fields=["claim", "misinformation_amount", "certainty", "model", "checked_at"],
+    )
+
+
+def _apply_verdict(
+    contents: list[BiasedContent], verdict: CheckBSResponse | None
+) -> list[BiasedContent]:
+    if verdict is None or verdict.certainity < 0.5:
+        return []
+    for content in contents:
+        content.accuracy = 1 - verdict.misinformation_amount
+        content.accuracy_certainty = verdict.certainity
+    return contents
+
+
+def _save_checked(contents: list[BiasedContent]) -> None:
+    """Save newly fact-checked contents and fold them into their media's totals."""
+    by_media: dict[int, list[float]] = defaultdict(list)
+    for content in contents:
+        by_media[content.media_id].append(content.accuracy)
+    with transaction.atomic():
+        BiasedContent.objects.bulk_update(contents, ["accuracy", "accuracy_certainty"])
+        for media_id, accuracies in by_media.items():
+            BiasedMedia.add_accuracies(media_id, accuracies)
+        transaction.on_commit(lambda: payload_cache.invalidate_media(list(by_media)))
+
+
+def fact_check_contents(
+    contents: list[BiasedContent],
+    on_checked: Callable[[list[BiasedContent]], None] | None = None,
+) -> list[BiasedContent]:
+    """Fact-check and save ``contents``, returning them updated.
+
+    Statements that already have an accuracy are skipped, and claims with a
+    cached verdict are answered from ``FactCheckVerdict`` without asking the
+    model. Verdicts the model isn't at least half sure about are discarded.
+    Results are saved as they arrive, and each saved group of contents is
+    passed to ``on_checked``.
+    """
+    by_claim: dict[str, list[BiasedContent]] = defaultdict(list)
+    for content in contents:
+        if content.accuracy is None:
+            by_claim[claim_hash(content.content)].append(content)
+
+    def save(checked: list[BiasedContent]) -> None:
+        if checked:
+            writer.run(_save_checked, checked)
+            if on_checked is not None:
+                on_checked(checked)
+
+    cached = cached_verdicts(by_claim)
+    save([c for d, v in cached.items() for c in _apply_verdict(by_claim[d], v)])
+
+    digests = [digest for digest in by_claim if digest not in cached]
+    claims = [by_claim[digest][0].content for digest in digests]
+
+    def on_batch(start: int, verdicts: list[CheckBSResponse | None]) -> None:
+        batch = dict(zip(digests[start:], zip(claims[start:], verdicts)))
+        # Queued without waiting so it can share a transaction with the save.
+        stored = writer.submit(
+            store_verdicts, {d: cv for d, cv in batch.items() if cv[1] is not None}
+        )
+        save([c for d, (_, v) in batch.items() for c in _apply_verdict(by_claim[d], v)])
+        stored.result()
+
+    get_checker().check(claims, on_batch)
+    return contents
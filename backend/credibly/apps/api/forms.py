@@ -10,4 +10,4 @@ class MediaDataForm(forms.Form):
 
     def clean_media(self):
         media = self.cleaned_data["media"]
-        return BiasedMedia.objects.get(url=media)
+        return BiasedMedia.objects.select_related("creator").for_url(media).get()
@@ -0,0 +1,139 @@
+"""Pick the frames of a video that are worth running OCR on.
+
+Most short-form videos are long stretches of nearly identical frames, so
+instead of reading a frame every second we sample on a fixed time grid and
+only keep a frame when it looks different from the last one we kept: either
+the text in it changed, or the scene changed and its perceptual hash is
+more than a few bits away from the kept frame's.
+"""
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+from django.conf import settings
+
+# Scenes are compared at this width, which is plenty to tell them apart and
+# keeps the per-frame cost negligible next to OCR. Text needs a little more
+# resolution for its lines to stand apart from the rest of the picture.
+_COMPARE_WIDTH = 160
+_TEXT_WIDTH = 320
+
+
+@dataclass
+class _Signature:
+    hash: np.ndarray
+    histogram: np.ndarray
+    # Grayscale at _TEXT_WIDTH, and where the text in it is.
+    gray: np.ndarray
+    text_mask: np.ndarray
+
+
+def perceptual_hash(gray: np.ndarray, size: int = 16) -> np.ndarray:
+    """Difference hash of a grayscale image, as a boolean array."""
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    return small[:, 1:] > small[:, :-1]
+
+
+def _resize(gray: np.ndarray, width: int) -> np.ndarray:
+    height = max(1, round(gray.shape[0] * width / gray.shape[1]))
+    return cv2.resize(gray, (width, height), interpolation=cv2.INTER_AREA)
+
+
+def _text_mask(edges: np.ndarray) -> np.ndarray:
+    """Boxes around the blocks of ``edges`` that look like lines of text.
+
+    Closing the edge map horizontally merges the letters of a line into one
+    block. Only blocks shaped like a line (at least twice as wide as tall,
+    a few pixels to a twelfth of the frame high) that are densely filled
+    with edges are kept, so the outlines of faces, hair and other moving
+    subjects don't count as text.
+    """
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (9, 3))
+    closed = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(closed)
+    mask = np.zeros(edges.shape, dtype=bool)
+    max_height = edges.shape[0] // 12
+    for x, y, w, h, area in stats[1:count]:
+        if not (5 <= h <= max_height and w >= 2 * h and area >= 0.4 * w * h):
+            continue
+        if np.count_nonzero(edges[y : y + h, x : x + w]) >= 0.15 * w * h:
+            mask[y : y + h, x : x + w] = True
+    return mask
+
+
+def _signature(frame: np.ndarray) -> _Signature:
+    gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+    small = _resize(gray, _COMPARE_WIDTH)
+    histogram = cv2.calcHist([small], [0], None, [32], [0, 256])
+    cv2.normalize(histogram, histogram)
+    gray = _resize(gray, _TEXT_WIDTH)
+    text_mask = _text_mask(cv2.Canny(gray, 100, 200))
+    return _Signature(perceptual_hash(small), histogram, gray, text_mask)
+
+
+def _text_change(new: _Signature, old: _Signature, max_shift: int = 3) -> float:
+    """How much the text of ``new`` differs from the same area of ``old``.
+
+    One minus the normalized correlation of the two frames over the box
+    holding either frame's text, at whichever shift of up to ``max_shift``
+    pixels matches best, so text that only moved a little (camera shake,
+    re-encoding) doesn't count as changed.
+    """
+    rows, columns = np.nonzero(new.text_mask | old.text_mask)
+    if not len(rows):
+        return 0.0
+    top, bottom = rows.min(), rows.max() + 1
+    left, right = columns.min(), columns.max() + 1
+    text = new.gray[top:bottom, left:right]
+    around = cv2.copyMakeBorder(old.gray, *[max_shift] * 4, cv2.BORDER_REPLICATE)[
+        top : bottom + 2 * max_shift, left : right + 2 * max_shift
+    ]
+    match = cv2.matchTemplate(around, text, cv2.TM_CCOEFF_NORMED)
+    return 1 - float(match.max())
+
+
+class KeyframeFilter:
+    """Decides whether a frame differs enough from the last accepted one."""
+
+    def __init__(
+        self,
+        hash_distance: int = 12,
+        scene_threshold: float = 0.9,
+        text_change: float = 0.1,
+    ):
+        self.hash_distance = hash_distance
+        self.scene_threshold = scene_threshold
+        self.text_change = text_change
+        self.last: _Signature | None = None
+
+    def accept(self, frame: np.ndarray) -> bool:
+        signature = _signature(frame)
+        if self.last is None or self._differs(signature, self.last):
+            self.last = signature
+            return True
+        return False
+
+    def _differs(self, new: _Signature, old: _Signature) -> bool:
+        # New text is what OCR is for, and a caption changing in place barely
+        # moves the hash or the histogram, so it counts on its own.
+        if _text_change(new, old) > self.text_change:
+            return True
+
+        # Otherwise only a real scene change is worth reading again; the hash
+        # just weeds out near-duplicates before comparing histograms.
+        if np.count_nonzero(new.hash != old.hash) <= self.hash_distance:
+            return False
+        correlation = cv2.compareHist(new.histogram, old.histogram, cv2.HISTCMP_CORREL)
+        return correlation < self.scene_threshold
+
+
+def sample_keyframes(clip) -> Iterator[tuple[float, np.ndarray]]:
+    """Yield ``(seconds, RGB frame)`` for the frames of ``clip`` worth OCR'ing."""
+    options = dict(settings.KEYFRAME_SAMPLING)
+    interval = options.pop("interval")
+    keyframes = KeyframeFilter(**options)
+    for i, frame in enumerate(clip.iter_frames(fps=1 / interval)):
+        if keyframes.accept(frame):
+            yield i * interval, frame
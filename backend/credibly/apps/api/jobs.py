@@ -0,0 +1,93 @@
+"""Registry of in-flight analyses, so each video is only processed once.
+
+Jobs are keyed on :func:`media_key` rather than the raw URL, so the many URL
+forms TikTok hands out for the same video (``?lang=en``, ``/embed/``, share
+tracking parameters) all attach to one job. The registry lives in the default
+Django cache, which must be shared by the web processes and the Celery
+workers (``settings.CACHES`` puts it in Redis): jobs are claimed in one and
+released in the other.
+"""
+
+import re
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+
+_TIKTOK_VIDEO_ID = re.compile(r"tiktok\.com/.*?(?:video|embed(?:/v2)?)/(\d+)")
+
+
+def video_id(url: str) -> str | None:
+    """Return the platform's video id if it can be read straight off the URL."""
+    match = _TIKTOK_VIDEO_ID.search(url)
+    return match.group(1) if match else None
+
+
+def media_key(url: str) -> str:
+    if (vid := video_id(url)) is not None:
+        return f"tiktok:{vid}"
+    parts = urlsplit(url.strip())
+    return f"{parts.netloc.lower().removeprefix('www.')}{parts.path.rstrip('/')}"
+
+
+def _cache_key(key: str) -> str:
+    return f"analysis-job:{key}"
+
+
+def claim(key: str, task_id: str) -> bool:
+    """Register ``task_id`` as the job for ``key``; False if one is running."""
+    return cache.add(_cache_key(key), task_id, settings.ANALYSIS_JOB_TIMEOUT)
+
+
+def reassign(key: str, task_id: str) -> None:
+    """Hand the job for ``key`` over to ``task_id``, which replaces it."""
+    cache.set(_cache_key(key), task_id, settings.ANALYSIS_JOB_TIMEOUT)
+
+
+def current(key: str) -> str | None:
+    return cache.get(_cache_key(key))
+
+
+def release(key: str) -> None:
+    cache.delete(_cache_key(key))
+    reset_running_score(key)
+
+
+def _queued_key(task_id: str) -> str:
+    return f"analysis-task:{task_id}"
+
+
+def record_queued(task_id: str) -> None:
+    """Remember that ``task_id`` was queued, for as long as its result is kept.
+
+    Celery reports every id it has no result for as pending, so this is what
+    tells a task still waiting in the queue from an id that never existed.
+    """
+    cache.set(_queued_key(task_id), True, settings.CELERY_RESULT_EXPIRES)
+
+
+def was_queued(task_id: str) -> bool:
+    return cache.get(_queued_key(task_id), False)
+
+
+# Running totals are stored as integers (in millionths) so they can be updated
+# with the cache's atomic incr from several workers at once.
+_SCALE = 1_000_000
+
+
+def _running_keys(key: str) -> tuple[str, str]:
+    return f"analysis-running:{key}:sum", f"analysis-running:{key}:count"
+
+
+def add_running_score(key: str, score: float) -> float:
+    """Add ``score`` to the job's running total and return the new average."""
+    sum_key, count_key = _running_keys(key)
+    cache.add(sum_key, 0, settings.ANALYSIS_JOB_TIMEOUT)
+    cache.add(count_key, 0, settings.ANALYSIS_JOB_TIMEOUT)
+    total = cache.incr(sum_key, round(score * _SCALE))
+    count = cache.incr(count_key)
+    return total / _SCALE / count
+
+
+def reset_running_score(key: str) -> None:
+    cache.delete_many(_running_keys(key))
@@ -0,0 +1,61 @@
+import random
+import timeit
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from ... import pipeline
+from ...scoring import LexiconScorer, TextBlobScorer, load_lexicon
+
+FILLER = (
+    "the a is it to of and in that we they you this , . ! not no never "
+    "very really don't isn't"
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the throughput of the TextBlob and vectorized lexicon sentence "
+        "scorers, and how far apart their scores are."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--file", help="Score the sentences of this text file instead of random ones"
+        )
+        parser.add_argument("--sentences", type=int, default=2000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, file, sentences, repeat, **options):
+        lexicon = load_lexicon()
+        if file:
+            with open(file) as f:
+                batch = pipeline.split_sentences(f.read())
+        else:
+            batch = self.random_sentences(list(lexicon), sentences)
+
+        scorers = [("TextBlob", TextBlobScorer()), ("lexicon", LexiconScorer(lexicon))]
+        self.stdout.write(f"{len(batch)} sentences, best of {repeat} runs")
+        baseline = None
+        for name, scorer in scorers:
+            best = min(timeit.repeat(lambda: scorer.score(batch), number=1, repeat=repeat))
+            baseline = baseline or best
+            self.stdout.write(
+                f"  {name:<10} {len(batch) / best:10.0f} sentences/s  ({baseline / best:.1f}x)"
+            )
+
+        difference = np.abs(scorers[0][1].score(batch) - scorers[1][1].score(batch))
+        self.stdout.write(
+            f"  score difference: max {difference.max():.2e}, mean {difference.mean():.2e}"
+        )
+
+    @staticmethod
+    def random_sentences(words: list[str], count: int) -> list[str]:
+        rng = random.Random(0)
+        return [
+            " ".join(
+                rng.choice(words if rng.random() < 0.3 else FILLER)
+                for _ in range(rng.randint(4, 30))
+            )
+            for _ in range(count)
+        ]
@@ -0,0 +1,73 @@
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from ... import payloads
+from ...models import BiasedContent, BiasedMedia
+from ...serializers import BiasedMediaSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare DRF serialization of a media payload against the lean "
+        "values() + fast JSON path. Test data is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--statements", type=int, default=500)
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def handle(self, *args, statements, repeat, **options):
+        try:
+            with transaction.atomic():
+                self.run(statements, repeat)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, statements, repeat):
+        media = BiasedMedia.objects.create(
+            name="benchmark", url="https://example.com/benchmark", complete=True
+        )
+        BiasedContent.objects.bulk_create(
+            BiasedContent(
+                media=media,
+                content=f"Statement number {i} about something.",
+                bias_strength=random.random(),
+                accuracy=random.random(),
+            )
+            for i in range(statements)
+        )
+        renderer = JSONRenderer()
+
+        def drf():
+            m = BiasedMedia.objects.get(pk=media.pk)
+            return renderer.render(BiasedMediaSerializer(m).data)
+
+        def drf_prefetched():
+            m = BiasedMedia.objects.with_content().get(pk=media.pk)
+            return renderer.render(BiasedMediaSerializer(m).data)
+
+        def lean():
+            return payloads.dumps(payloads.media_payload_for_url(media.url))
+
+        encoder = "orjson" if payloads.orjson is not None else "json"
+        self.stdout.write(f"{statements} statements, best of {repeat} runs")
+        baseline = None
+        for name, func in [
+            ("DRF serializer", drf),
+            ("DRF serializer, prefetched", drf_prefetched),
+            (f"values() + {encoder}", lean),
+        ]:
+            best = min(timeit.repeat(func, number=1, repeat=repeat))
+            baseline = baseline or best
+            self.stdout.write(
+                f"  {name:<30} {best * 1000:8.2f} ms  ({baseline / best:.1f}x)"
+            )
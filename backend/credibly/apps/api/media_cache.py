@@ -0,0 +1,176 @@
+"""On-disk cache of downloaded media, keyed by video id.
+
+Each video is extracted once with yt_dlp and stored as the cheapest streams
+that are good enough for analysis: the best audio-only stream for
+transcription and a low-resolution video stream for OCR. When a site only
+offers combined streams, both resolve to the same format and the file is only
+downloaded once. The cache is bounded by ``MEDIA_CACHE["max_bytes"]`` and
+evicts the least recently used videos first.
+
+Workers on several nodes may share the cache directory, so a video is only
+downloaded while holding an ``fcntl`` lock on its lock file.
+"""
+
+import copy
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import yt_dlp
+from django.conf import settings
+
+from . import jobs
+
+logger = logging.getLogger(__name__)
+
+_YDL_OPTIONS = {"quiet": True, "no_warnings": True, "noprogress": True}
+
+
+@dataclass
+class CachedMedia:
+    video_id: str
+    title: str
+    uploader: str | None
+    audio_path: str
+    video_path: str
+
+
+def _cache_dir() -> Path:
+    path = Path(settings.MEDIA_CACHE["dir"])
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _metadata_path(video_id: str) -> Path:
+    return _cache_dir() / f"{video_id}.json"
+
+
+@contextmanager
+def _locked(video_id: str) -> Iterator[None]:
+    """Hold an exclusive lock on ``video_id`` across threads, processes and nodes."""
+    # Lock files live apart from the entries, so eviction never deletes one
+    # that another worker has locked and lets a third lock a new file.
+    lock_dir = _cache_dir() / ".locks"
+    lock_dir.mkdir(exist_ok=True)
+    with open(lock_dir / f"{video_id}.lock", "a") as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def _write_metadata(media: CachedMedia) -> None:
+    """Write the metadata so readers see either all of it or none."""
+    with tempfile.NamedTemporaryFile(
+        "w", dir=_cache_dir(), prefix=f".{media.video_id}.", delete=False
+    ) as file:
+        json.dump(asdict(media), file)
+    os.replace(file.name, _metadata_path(media.video_id))
+
+
+def _entry_files(video_id: str) -> list[Path]:
+    return list(_cache_dir().glob(f"{video_id}.*"))
+
+
+def _touch(video_id: str) -> None:
+    now = time.time()
+    for path in _entry_files(video_id):
+        os.utime(path, (now, now))
+
+
+def lookup(video_id: str) -> CachedMedia | None:
+    """Return the cached media for ``video_id`` if all of its files exist."""
+    try:
+        media = CachedMedia(**json.loads(_metadata_path(video_id).read_text()))
+    except (FileNotFoundError, TypeError, ValueError):
+        return None
+    if not (os.path.exists(media.audio_path) and os.path.exists(media.video_path)):
+        return None
+    _touch(video_id)
+    return media
+
+
+def _download(info: dict, format_spec: str) -> str:
+    options = {
+        **_YDL_OPTIONS,
+        "format": format_spec,
+        "outtmpl": str(_cache_dir() / "%(id)s.%(format_id)s.%(ext)s"),
+    }
+    with yt_dlp.YoutubeDL(options) as ydl:
+        # Reuse the extracted info rather than extracting again per stream.
+        result = ydl.process_ie_result(copy.deepcopy(info), download=True)
+    return result["requested_downloads"][0]["filepath"]
+
+
+def fetch(url: str, video_id: str | None = None) -> CachedMedia:
+    """Return the media for ``url``, downloading it only on a cache miss.
+
+    Pass ``video_id`` when it is already known to skip extraction on a hit.
+    """
+    video_id = video_id or jobs.video_id(url)
+    if video_id is not None and (media := lookup(video_id)) is not None:
+        return media
+
+    with yt_dlp.YoutubeDL(_YDL_OPTIONS) as ydl:
+        info = ydl.extract_info(url, download=False)
+
+    with _locked(info["id"]):
+        # Checked under the lock, as another worker may have downloaded it
+        # in the meantime.
+        if (media := lookup(info["id"])) is not None:
+            return media
+
+        options = settings.MEDIA_CACHE
+        video_path = _download(info, options["video_format"])
+        # Fall back to the video stream's format so a site without audio-only
+        # streams doesn't get a second combined download.
+        audio_path = _download(info, f"{options['audio_format']}/{options['video_format']}")
+
+        media = CachedMedia(
+            video_id=info["id"],
+            title=info.get("title") or info["id"],
+            uploader=info.get("uploader"),
+            audio_path=audio_path,
+            video_path=video_path,
+        )
+        _write_metadata(media)
+    evict(keep=media.video_id)
+    return media
+
+
+def evict(keep: str | None = None) -> None:
+    """Delete least recently used videos until the cache fits its budget.
+
+    Videos used within ``ANALYSIS_JOB_TIMEOUT`` may still be in use by a
+    running job, so they are left alone even if that means going over.
+    """
+    entries: dict[str, list[Path]] = {}
+    for path in _cache_dir().iterdir():
+        # Lock files and metadata still being written.
+        if path.name.startswith("."):
+            continue
+        entries.setdefault(path.name.split(".", 1)[0], []).append(path)
+
+    def last_used(files: list[Path]) -> float:
+        return max(path.stat().st_mtime for path in files)
+
+    total = sum(path.stat().st_size for files in entries.values() for path in files)
+    limit = settings.MEDIA_CACHE["max_bytes"]
+    cutoff = time.time() - settings.ANALYSIS_JOB_TIMEOUT
+    for video_id, files in sorted(entries.items(), key=lambda e: last_used(e[1])):
+        if total <= limit:
+            break
+        if video_id == keep or last_used(files) > cutoff:
+            continue
+        for path in files:
+            total -= path.stat().st_size
+            path.unlink(missing_ok=True)
+        logger.info("Evicted %s from the media cache", video_id)
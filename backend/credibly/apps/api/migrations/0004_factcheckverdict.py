@@ -0,0 +1,26 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:12
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_contentcreator_biasedmedia_creator'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FactCheckVerdict',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('claim_hash', models.CharField(max_length=64, unique=True)),
+                ('claim', models.TextField()),
+                ('misinformation_amount', models.FloatField(validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(1)])),
+                ('certainty', models.FloatField(validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(1)])),
+                ('model', models.CharField(help_text='The model and prompt version that produced the verdict', max_length=100)),
+                ('checked_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:02
+
+from django.db import migrations, models
+
+
+def compute_aggregates(apps, schema_editor):
+    BiasedMedia = apps.get_model("api", "BiasedMedia")
+    media = BiasedMedia.objects.annotate(
+        _content_count=models.Count("biased_content"),
+        _bias_sum=models.Sum("biased_content__bias_strength", default=0),
+        _scored_count=models.Count("biased_content__accuracy"),
+        _accuracy_sum=models.Sum("biased_content__accuracy", default=0),
+    )
+    for m in media:
+        m.content_count = m._content_count
+        m.bias_sum = m._bias_sum
+        m.bias_mean = m._bias_sum / m._content_count if m._content_count else 0
+        m.scored_count = m._scored_count
+        m.accuracy_sum = m._accuracy_sum
+        m.accuracy_mean = m._accuracy_sum / m._scored_count if m._scored_count else 0
+        m.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_factcheckverdict'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='biasedmedia',
+            name='accuracy_mean',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='biasedmedia',
+            name='accuracy_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='biasedmedia',
+            name='bias_mean',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='biasedmedia',
+            name='bias_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='biasedmedia',
+            name='content_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='biasedmedia',
+            name='scored_count',
+            field=models.PositiveIntegerField(default=0, help_text='How many statements have an accuracy'),
+        ),
+        migrations.RunPython(compute_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def compute_creator_scores(apps, schema_editor):
+    ContentCreator = apps.get_model("api", "ContentCreator")
+    CreatorScore = apps.get_model("api", "CreatorScore")
+    creators = ContentCreator.objects.annotate(
+        _scored_count=models.Count("media_set__biased_content__accuracy"),
+        _accuracy_sum=models.Sum("media_set__biased_content__accuracy", default=0),
+    ).filter(_scored_count__gt=0)
+    CreatorScore.objects.bulk_create(
+        [
+            CreatorScore(
+                creator=creator,
+                scored_count=creator._scored_count,
+                accuracy_sum=creator._accuracy_sum,
+                avg_accuracy=creator._accuracy_sum / creator._scored_count,
+            )
+            for creator in creators
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_biasedmedia_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CreatorScore',
+            fields=[
+                ('creator', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='api.contentcreator')),
+                ('scored_count', models.PositiveIntegerField(default=0)),
+                ('accuracy_sum', models.FloatField(default=0)),
+                ('avg_accuracy', models.FloatField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-avg_accuracy', 'creator'], name='creator_leaderboard_idx')],
+            },
+        ),
+        migrations.RunPython(compute_creator_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_biasedmedia_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='biasedmedia',
+            index=models.Index(fields=['creator', '-accuracy_mean'], name='media_creator_accuracy_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='biasedmedia',
+            index=models.Index(fields=['-bias_mean'], name='media_bias_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='biasedcontent',
+            index=models.Index(fields=['media', 'id'], name='content_media_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='biasedcontent',
+            index=models.Index(fields=['media', 'accuracy'], name='content_media_accuracy_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+def fill_media_keys(apps, schema_editor):
+    from credibly.apps.api.jobs import media_key
+
+    BiasedMedia = apps.get_model("api", "BiasedMedia")
+    seen = set()
+    # Rows saved under different forms of one video's URL would share a key.
+    # The completed (then oldest) one keeps it; the others get a key of their
+    # own so they stay reachable by pk until cleaned up.
+    for media in BiasedMedia.objects.order_by("-complete", "pk"):
+        key = media_key(media.url)
+        media.media_key = key if key not in seen else f"{key}#{media.pk}"
+        seen.add(key)
+        media.save(update_fields=["media_key"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_score_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='biasedmedia',
+            name='media_key',
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.RunPython(fill_media_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='biasedmedia',
+            name='media_key',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+    ]
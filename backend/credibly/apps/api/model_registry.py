@@ -0,0 +1,149 @@
+"""Process-wide registry for the inference models used by the pipeline.
+
+Models are loaded on first use and shared by every caller in the process, so
+importing the views, consumers and Socket.IO server together only ever holds
+one copy of each set of weights. Per-model options come from
+``settings.INFERENCE_MODELS``.
+"""
+
+import logging
+import threading
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_loaders: dict[str, Callable[[dict[str, Any]], Any]] = {}
+_instances: dict[str, Any] = {}
+_locks: dict[str, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+def loader(name: str):
+    """Register the function used to build the model called ``name``."""
+
+    def decorator(func: Callable[[dict[str, Any]], Any]):
+        _loaders[name] = func
+        _locks[name] = threading.Lock()
+        return func
+
+    return decorator
+
+
+def model_config(name: str) -> dict[str, Any]:
+    return dict(getattr(settings, "INFERENCE_MODELS", {}).get(name, {}))
+
+
+def _set_threads(config: dict[str, Any]) -> None:
+    threads = config.get("threads")
+    if threads:
+        import torch
+
+        torch.set_num_threads(threads)
+
+
+@loader("asr")
+def _load_asr(config: dict[str, Any]):
+    from .asr import BACKENDS
+
+    backend = config.get("backend", "whisper")
+    if backend == "whisper":
+        _set_threads(config)
+    return BACKENDS[backend](config)
+
+
+@loader("easyocr")
+def _load_easyocr(config: dict[str, Any]):
+    import easyocr
+
+    _set_threads(config)
+    device = config.get("device", "cpu")
+    return easyocr.Reader(
+        config.get("languages", ["en"]),
+        gpu=device != "cpu",
+        verbose=False,
+    )
+
+
+@loader("scorer")
+def _load_scorer(config: dict[str, Any]):
+    from .scoring import SCORERS
+
+    return SCORERS[config.get("backend", "lexicon")]()
+
+
+def build(name: str, config: dict[str, Any] | None = None) -> Any:
+    """Load a private instance of ``name``, bypassing the shared one.
+
+    Used by worker processes that can't read Django settings themselves, so
+    the config is passed in explicitly.
+    """
+    return _loaders[name](model_config(name) if config is None else config)
+
+
+def get(name: str) -> Any:
+    """Return the shared instance of ``name``, loading it if needed."""
+    try:
+        return _instances[name]
+    except KeyError:
+        pass
+
+    if name not in _loaders:
+        raise KeyError(f"No model loader registered for {name!r}")
+
+    with _locks[name]:
+        if name not in _instances:
+            logger.info("Loading %s model", name)
+            _instances[name] = _loaders[name](model_config(name))
+    return _instances[name]
+
+
+def is_loaded(name: str) -> bool:
+    return name in _instances
+
+
+def get_audio_model():
+    return get("asr")
+
+
+def get_ocr_reader():
+    return get("easyocr")
+
+
+def get_scorer():
+    return get("scorer")
+
+
+_warmup_thread: threading.Thread | None = None
+
+
+def _warm(names: Iterable[str]) -> None:
+    for name in names:
+        try:
+            get(name)
+        except Exception:
+            logger.exception("Failed to warm up %s model", name)
+
+
+def warmup(names: Iterable[str] | None = None) -> None:
+    """Start loading models in a background thread.
+
+    Safe to call more than once; only the first call starts a thread, and a
+    caller that needs a model before warmup is done simply waits on that
+    model's lock instead of loading a second copy.
+    """
+    global _warmup_thread
+
+    if not getattr(settings, "INFERENCE_WARMUP", True):
+        return
+
+    with _registry_lock:
+        if _warmup_thread is not None:
+            return
+        names = list(names if names is not None else _loaders)
+        _warmup_thread = threading.Thread(
+            target=_warm, args=(names,), name="model-warmup", daemon=True
+        )
+        _warmup_thread.start()
@@ -1,10 +1,29 @@
 from django.db import models
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from .jobs import media_key
+
+
+class BiasedMediaQuerySet(models.QuerySet):
+    def for_url(self, url: str):
+        """Media for the video at ``url``, whichever form of its URL it is."""
+        return self.filter(media_key=media_key(url))
+
+    def with_content(self):
+        """Fetch the creator and statements up front for nested serialization."""
+        return self.select_related("creator").prefetch_related(
+            models.Prefetch(
+                "biased_content", queryset=BiasedContent.objects.order_by("pk")
+            )
+        )
+
 
 class BiasedMedia(models.Model):
     name = models.CharField(max_length=255)
     url = models.URLField(unique=True)
+    # jobs.media_key(url): every URL form of a video maps to the same row.
+    media_key = models.CharField(max_length=255, unique=True)
     complete = models.BooleanField(default=False)
 
     creator = models.ForeignKey(
@@ -14,11 +33,71 @@ class BiasedMedia(models.Model):
         null=True,
     )
 
-    objects = models.Manager()
+    # Aggregates over biased_content, kept up to date as content is written
+    # and fact-checked so that serving a verdict never has to scan the rows.
+    content_count = models.PositiveIntegerField(default=0)
+    bias_sum = models.FloatField(default=0)
+    bias_mean = models.FloatField(default=0)
+    scored_count = models.PositiveIntegerField(
+        default=0, help_text="How many statements have an accuracy"
+    )
+    accuracy_sum = models.FloatField(default=0)
+    accuracy_mean = models.FloatField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = BiasedMediaQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["creator", "-accuracy_mean"], name="media_creator_accuracy_idx"),
+            models.Index(fields=["-bias_mean"], name="media_bias_idx"),
+        ]
 
     def __str__(self) -> str:
         return self.name
 
+    def save(self, *args, **kwargs):
+        if not self.media_key:
+            self.media_key = media_key(self.url)
+        super().save(*args, **kwargs)
+
+    @property
+    def average_misinformation(self) -> float:
+        return 1 - self.accuracy_mean if self.scored_count else 0
+
+    def set_bias_aggregates(self, bias_strengths: list[float]) -> None:
+        """Reset the aggregates for freshly written content (doesn't save)."""
+        self.content_count = len(bias_strengths)
+        self.bias_sum = sum(bias_strengths)
+        self.bias_mean = self.bias_sum / self.content_count if self.content_count else 0
+        self.scored_count = 0
+        self.accuracy_sum = 0
+        self.accuracy_mean = 0
+
+    @classmethod
+    def add_accuracies(cls, media_id: int, accuracies: list[float]) -> None:
+        """Fold newly fact-checked statements into the media's aggregates.
+
+        Done as a single UPDATE so concurrent fact-check batches can't lose
+        each other's counts.
+        """
+        if not accuracies:
+            return
+        total = models.F("accuracy_sum") + sum(accuracies)
+        count = models.F("scored_count") + len(accuracies)
+        cls.objects.filter(pk=media_id).update(
+            accuracy_sum=total,
+            scored_count=count,
+            accuracy_mean=total / count,
+            updated_at=timezone.now(),
+        )
+        creator_id = (
+            cls.objects.filter(pk=media_id).values_list("creator_id", flat=True).first()
+        )
+        if creator_id is not None:
+            CreatorScore.add_accuracies(creator_id, accuracies)
+
 
 class BiasedContent(models.Model):
     media = models.ForeignKey(
@@ -43,9 +122,82 @@ class BiasedContent(models.Model):
         validators=[MinValueValidator(0), MaxValueValidator(1)]
     )
 
+    class Meta:
+        indexes = [
+            # Statements of a media in order, and which of them still need
+            # fact-checking, without touching the table.
+            models.Index(fields=["media", "id"], name="content_media_idx"),
+            models.Index(fields=["media", "accuracy"], name="content_media_accuracy_idx"),
+        ]
+
     def __str__(self) -> str:
         return f"{self.media.name} - {self.content[:50]}"
 
 
 class ContentCreator(models.Model):
     name = models.CharField(max_length=255)
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class CreatorScore(models.Model):
+    """Running accuracy totals for a creator, across all of their media.
+
+    Maintained alongside ``BiasedMedia.add_accuracies`` so the leaderboard is
+    an indexed read rather than an aggregate over every statement.
+    """
+
+    creator = models.OneToOneField(
+        ContentCreator,
+        related_name="score",
+        on_delete=models.CASCADE,
+        primary_key=True,
+    )
+    scored_count = models.PositiveIntegerField(default=0)
+    accuracy_sum = models.FloatField(default=0)
+    avg_accuracy = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["-avg_accuracy", "creator"], name="creator_leaderboard_idx"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.creator.name} - {self.avg_accuracy:.2f}"
+
+    @classmethod
+    def add_accuracies(cls, creator_id: int, accuracies: list[float]) -> None:
+        cls.objects.get_or_create(creator_id=creator_id)
+        total = models.F("accuracy_sum") + sum(accuracies)
+        count = models.F("scored_count") + len(accuracies)
+        cls.objects.filter(creator_id=creator_id).update(
+            accuracy_sum=total,
+            scored_count=count,
+            avg_accuracy=total / count,
+        )
+
+
+class FactCheckVerdict(models.Model):
+    """A cached fact-check result, shared by every statement with the same claim."""
+
+    claim_hash = models.CharField(max_length=64, unique=True)
+    claim = models.TextField()
+
+    misinformation_amount = models.FloatField(
+        validators=[MinValueValidator(0), MaxValueValidator(1)]
+    )
+    certainty = models.FloatField(
+        validators=[MinValueValidator(0), MaxValueValidator(1)]
+    )
+
+    model = models.CharField(
+        max_length=100,
+        help_text="The model and prompt version that produced the verdict",
+    )
+    checked_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return self.claim[:50]
@@ -0,0 +1,38 @@
+"""Push pipeline progress and results to clients watching a URL.
+
+Everything interested in a URL (WebSocket consumers, the Socket.IO server)
+joins the channel layer group returned by :func:`group_for`, and the Celery
+tasks publish to it with :func:`publish`. Messages are dispatched to the
+consumer's ``media_event`` handler.
+"""
+
+import hashlib
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from . import jobs
+
+
+def group_for(url: str) -> str:
+    # Every URL for the same video shares a group. Group names must be short
+    # and ASCII, which URLs are not, hence the hash.
+    return "media." + hashlib.sha1(jobs.media_key(url).encode()).hexdigest()
+
+
+def _message(event: str, data: dict) -> dict:
+    return {"type": "media.event", "event": event, "data": data}
+
+
+def publish(url: str, event: str, data: dict) -> None:
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    async_to_sync(layer.group_send)(group_for(url), _message(event, data))
+
+
+async def apublish(url: str, event: str, data: dict) -> None:
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    await layer.group_send(group_for(url), _message(event, data))
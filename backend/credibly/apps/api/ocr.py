@@ -0,0 +1,149 @@
+"""Batched, optionally multi-process OCR over sampled video frames.
+
+Frames are downscaled to ``OCR_SETTINGS["width"]`` and handed to EasyOCR in
+batches. With ``OCR_SETTINGS["processes"]`` above zero the batches are spread
+over a pool of spawned processes, each holding its own reader; otherwise they
+run on the shared reader in this process.
+
+Celery's default prefork pool can't start child processes, so a pool of OCR
+processes needs the worker to run with ``--pool threads`` or ``--pool solo``.
+"""
+
+import os
+import threading
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import get_context
+
+import cv2
+import numpy as np
+from django.conf import settings
+
+from . import model_registry
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+# The reader owned by a pool process.
+_process_reader = None
+
+
+def _init_process(config: dict) -> None:
+    global _process_reader
+    _process_reader = model_registry.build("easyocr", config)
+
+
+def _read_batch(reader, frames: list[np.ndarray], batch_size: int) -> list[list[str]]:
+    return reader.readtext_batched(frames, batch_size=batch_size, detail=0)
+
+
+def _read_batch_in_process(frames: list[np.ndarray], batch_size: int) -> list[list[str]]:
+    return _read_batch(_process_reader, frames, batch_size)
+
+
+def _get_pool(processes: int) -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            config = model_registry.model_config("easyocr")
+            # Split the cores between the processes instead of letting every
+            # process's torch grab all of them.
+            config["threads"] = max(1, (os.cpu_count() or 1) // processes)
+            _pool = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=get_context("spawn"),
+                initializer=_init_process,
+                initargs=(config,),
+            )
+        return _pool
+
+
+def prepare_frame(frame: np.ndarray, width: int) -> np.ndarray:
+    """Convert an RGB frame to the BGR EasyOCR expects, shrunk to ``width``."""
+    height, current_width = frame.shape[:2]
+    if current_width > width:
+        frame = cv2.resize(
+            frame,
+            (width, round(height * width / current_width)),
+            interpolation=cv2.INTER_AREA,
+        )
+    return cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+
+
+def _batches(
+    frames: Iterable[tuple[float, np.ndarray]], size: int
+) -> Iterator[tuple[list[float], list[np.ndarray]]]:
+    timestamps, images = [], []
+    for timestamp, image in frames:
+        timestamps.append(timestamp)
+        images.append(image)
+        if len(images) == size:
+            yield timestamps, images
+            timestamps, images = [], []
+    if images:
+        yield timestamps, images
+
+
+def _read_in_pool(
+    pool: ProcessPoolExecutor,
+    batches: Iterable[tuple[list[float], list[np.ndarray]]],
+    batch_size: int,
+    in_flight: int,
+) -> Iterator[tuple[list[float], list[list[str]]]]:
+    """Read ``batches`` in ``pool``, in order, with at most ``in_flight`` queued.
+
+    Submitting every batch up front would decode and hold the whole video's
+    frames in memory while the pool works through them.
+    """
+    pending: deque[tuple[list[float], Future]] = deque()
+    for timestamps, images in batches:
+        pending.append((timestamps, pool.submit(_read_batch_in_process, images, batch_size)))
+        if len(pending) >= in_flight:
+            timestamps, future = pending.popleft()
+            yield timestamps, future.result()
+    while pending:
+        timestamps, future = pending.popleft()
+        yield timestamps, future.result()
+
+
+def read_frames(
+    frames: Iterable[tuple[float, np.ndarray]],
+    on_frame: Callable[[float, list[str]], None] | None = None,
+) -> list[tuple[float, list[str]]]:
+    """OCR ``(seconds, RGB frame)`` pairs, returning ``(seconds, lines)``.
+
+    Frames with no text are dropped. Results come back in timestamp order,
+    and each is passed to ``on_frame`` as soon as its batch is done.
+    """
+    options = settings.OCR_SETTINGS
+    batch_size = options["batch_size"]
+    prepared = (
+        (timestamp, prepare_frame(frame, options["width"]))
+        for timestamp, frame in frames
+    )
+
+    if options["processes"] > 0:
+        # Two batches per process keeps every process busy while the next
+        # frames are decoded.
+        results = _read_in_pool(
+            _get_pool(options["processes"]),
+            _batches(prepared, batch_size),
+            batch_size,
+            options["processes"] * 2,
+        )
+    else:
+        reader = model_registry.get_ocr_reader()
+        results = (
+            (timestamps, _read_batch(reader, images, batch_size))
+            for timestamps, images in _batches(prepared, batch_size)
+        )
+
+    video_text = []
+    for timestamps, batch_lines in results:
+        for timestamp, lines in zip(timestamps, batch_lines):
+            if lines:
+                video_text.append((timestamp, lines))
+                if on_frame is not None:
+                    on_frame(timestamp, lines)
+    return video_text
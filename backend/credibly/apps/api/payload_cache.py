@@ -0,0 +1,114 @@
+"""Cache of the payloads served for completed analyses.
+
+Once ``BiasedMedia.complete`` is set the analysis only changes when fact-check
+scores come in, so the full payload is built once, stored in the "analysis"
+cache (local memory or Redis, see ``settings.CACHES``) with an ETag and
+modification time, and dropped by :func:`invalidate` whenever scores change.
+
+Entries are keyed by the video (every URL form of it shares one entry) and a
+version that :func:`invalidate` bumps, and a
+payload is only stored under the version read before its rows were, so a
+payload built from rows that changed in the meantime is written under a key
+nobody reads any more instead of overwriting the invalidation.
+"""
+
+import hashlib
+import time
+
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from . import jobs, payloads
+from .models import BiasedMedia
+
+cache = caches["analysis"]
+
+
+def _digest(url: str) -> str:
+    return hashlib.sha1(jobs.media_key(url).encode()).hexdigest()
+
+
+def _version_key(url: str) -> str:
+    return "media-payload-version:" + _digest(url)
+
+
+def _key(url: str, version: int) -> str:
+    return f"media-payload:{_digest(url)}:{version}"
+
+
+def build(media: BiasedMedia) -> dict:
+    payload = payloads.media_payload(media)
+    return {
+        "media": payload,
+        "average_bias": media.bias_mean,
+        "average_misinformation": media.average_misinformation,
+        "etag": quote_etag(hashlib.sha1(payloads.dumps(payload)).hexdigest()),
+        "last_modified": media.updated_at.timestamp(),
+    }
+
+
+def get_completed(url: str) -> dict | None:
+    """Return the cached payload for ``url`` if its analysis is complete."""
+    version = cache.get(_version_key(url))
+    if version is not None and (entry := cache.get(_key(url, version))) is not None:
+        return entry
+
+    media = (
+        BiasedMedia.objects.select_related("creator")
+        .for_url(url)
+        .filter(complete=True)
+        .first()
+    )
+    if media is None:
+        return None
+    entry = build(media)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(_version_key(url), version):
+            # Someone else got there first, possibly an invalidation since the
+            # rows were read, so leave caching to the next lookup.
+            return entry
+    cache.add(_key(url, version), entry)
+    return entry
+
+
+async def aget(url: str) -> dict | None:
+    """Async cache-only lookup; None on a miss."""
+    version = await cache.aget(_version_key(url))
+    if version is None:
+        return None
+    return await cache.aget(_key(url, version))
+
+
+def invalidate(urls) -> None:
+    for url in urls:
+        try:
+            cache.incr(_version_key(url))
+        except ValueError:
+            # Starting from the clock rather than 0 means a version key that
+            # expired can't come back pointing at entries from before.
+            cache.add(_version_key(url), time.time_ns())
+
+
+def invalidate_media(media_ids) -> None:
+    invalidate(BiasedMedia.objects.filter(pk__in=media_ids).values_list("url", flat=True))
+
+
+def tagged_response(entry: dict, payload):
+    """Respond with ``payload`` carrying the entry's ETag and Last-Modified."""
+    response = payloads.json_response(payload)
+    response.headers["ETag"] = entry["etag"]
+    response.headers["Last-Modified"] = http_date(int(entry["last_modified"]))
+    return response
+
+
+def conditional_response(request, entry: dict, payload):
+    """Like :func:`tagged_response`, but answer matching validators with 304."""
+    response = get_conditional_response(
+        request, etag=entry["etag"], last_modified=int(entry["last_modified"])
+    )
+    if response is None:
+        return tagged_response(entry, payload)
+    response.headers["ETag"] = entry["etag"]
+    return response
@@ -0,0 +1,71 @@
+"""Lean serialization for hot read paths.
+
+DRF serializers build a field object graph and an ``OrderedDict`` per row,
+which dominates response time for media with hundreds of statements. The
+helpers here pull plain dicts with ``values()`` and encode them with orjson
+when it is installed, producing the same JSON as ``BiasedMediaSerializer``.
+"""
+
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+from .models import BiasedContent, BiasedMedia
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional speedup
+    orjson = None
+
+CONTENT_FIELDS = ("content", "accuracy", "bias_strength")
+
+
+def dumps(payload) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, cls=DjangoJSONEncoder).encode()
+
+
+def content_payload(content: BiasedContent) -> dict:
+    return {field: getattr(content, field) for field in CONTENT_FIELDS}
+
+
+def content_payloads(media_id: int) -> list[dict]:
+    return list(
+        BiasedContent.objects.filter(media_id=media_id)
+        .order_by("pk")
+        .values(*CONTENT_FIELDS)
+    )
+
+
+def media_payload(media: BiasedMedia) -> dict:
+    """The ``BiasedMediaSerializer`` representation of ``media``."""
+    return {
+        "name": media.name,
+        "url": media.url,
+        "complete": media.complete,
+        "biased_content": content_payloads(media.pk),
+        "creator": str(media.creator) if media.creator_id is not None else None,
+    }
+
+
+def media_payload_for_url(url: str) -> dict | None:
+    media = (
+        BiasedMedia.objects.for_url(url)
+        .values("id", "name", "url", "complete", "creator__name")
+        .first()
+    )
+    if media is None:
+        return None
+    return {
+        "name": media["name"],
+        "url": media["url"],
+        "complete": media["complete"],
+        "biased_content": content_payloads(media["id"]),
+        "creator": media["creator__name"],
+    }
+
+
+def json_response(payload, status: int = 200) -> HttpResponse:
+    return HttpResponse(dumps(payload), status=status, content_type="application/json")
@@ -0,0 +1,130 @@
+"""The stages of the video analysis pipeline.
+
+Each stage is a plain function so it can be run by the Celery tasks in
+``tasks.py`` (or called directly from a shell when debugging).
+"""
+
+from collections.abc import Callable
+
+import moviepy
+from django.conf import settings
+from django.db import transaction
+from textblob import TextBlob
+
+from . import frames, model_registry, ocr, payload_cache, writer
+from .audio import SAMPLE_RATE, JoinedRegions, decode_audio, speech_regions
+from .models import BiasedContent, BiasedMedia
+
+
+def transcribe_audio(
+    media_path: str, on_segment: Callable[[dict], None] | None = None
+) -> list[dict]:
+    """Transcribe the audio of ``media_path`` into ``{start, end, text}`` segments.
+
+    Each segment is passed to ``on_segment`` as soon as it is transcribed. With
+    ``settings.ANALYSIS_STREAMING`` on, the audio is transcribed in chunks of
+    ``settings.TRANSCRIBE_CHUNK_SECONDS`` so the first segments arrive long
+    before the whole track is done. With ``settings.VOICE_ACTIVITY`` enabled,
+    only the stretches that sound like speech are transcribed, joined into
+    one buffer; timestamps are always relative to the start of the whole
+    track.
+    """
+    audio = decode_audio(media_path)
+
+    options = dict(settings.VOICE_ACTIVITY)
+    if options.pop("enabled"):
+        regions = speech_regions(audio, **options)
+    else:
+        regions = [(0, len(audio))]
+
+    speech = JoinedRegions(audio, regions)
+    if settings.ANALYSIS_STREAMING:
+        chunk_size = settings.TRANSCRIBE_CHUNK_SECONDS * SAMPLE_RATE
+    else:
+        chunk_size = len(speech.audio)
+
+    audio_model = model_registry.get_audio_model()
+    segments = []
+    for offset in range(0, len(speech.audio), max(chunk_size, 1)):
+        chunk = speech.audio[offset : offset + chunk_size]
+        for segment in audio_model.transcribe(chunk):
+            segment["start"] = speech.track_time(segment["start"] + offset / SAMPLE_RATE)
+            segment["end"] = speech.track_time(
+                segment["end"] + offset / SAMPLE_RATE, end=True
+            )
+            segments.append(segment)
+            if on_segment is not None:
+                on_segment(segment)
+    return segments
+
+
+def extract_frame_text(
+    video_path: str, on_frame: Callable[[float, list[str]], None] | None = None
+) -> list[tuple[float, list[str]]]:
+    """Run OCR over the video's keyframes, returning ``(seconds, lines)`` pairs.
+
+    ``on_frame`` is called with each pair as soon as it is read.
+    """
+    encoded_video = moviepy.VideoFileClip(video_path, audio=False)
+    try:
+        return ocr.read_frames(frames.sample_keyframes(encoded_video), on_frame)
+    finally:
+        encoded_video.close()
+
+
+def split_sentences(text: str) -> list[str]:
+    return [sentence.raw for sentence in TextBlob(text).sentences] if text else []
+
+
+def score_texts(texts: list[str]) -> list[list[tuple[str, float]]]:
+    """Split each text into sentences and score how subjective each one is.
+
+    All of the sentences are scored as one batch by the configured scorer.
+    """
+    split = [split_sentences(text) for text in texts]
+    sentences = [sentence for sentences in split for sentence in sentences]
+    if not sentences:
+        return [[] for _ in texts]
+    scores = iter(model_registry.get_scorer().score(sentences).tolist())
+    return [[(sentence, next(scores)) for sentence in sentences] for sentences in split]
+
+
+def score_text(text: str) -> list[tuple[str, float]]:
+    return score_texts([text])[0]
+
+
+def score_segment(segment: dict) -> list[tuple[str, float]]:
+    return score_text(segment["text"])
+
+
+def score_frame(lines: list[str]) -> list[tuple[str, float]]:
+    return score_text("\n".join(lines))
+
+
+def save_analysis(
+    media: BiasedMedia, scores: list[tuple[str, float]]
+) -> list[BiasedContent]:
+    """Store the scored sentences for ``media`` and mark it complete.
+
+    Everything is written in one transaction on the database writer thread,
+    so a crash never leaves a half-saved analysis behind, and rows from an
+    earlier incomplete run are replaced rather than duplicated.
+    """
+    return writer.run(_write_analysis, media, scores)
+
+
+def _write_analysis(
+    media: BiasedMedia, scores: list[tuple[str, float]]
+) -> list[BiasedContent]:
+    contents = [
+        BiasedContent(media=media, content=sentence, bias_strength=bias_strength)
+        for sentence, bias_strength in scores
+    ]
+    with transaction.atomic():
+        media.biased_content.all().delete()
+        contents = BiasedContent.objects.bulk_create(contents)
+        media.complete = True
+        media.set_bias_aggregates([bias_strength for _, bias_strength in scores])
+        media.save()
+        transaction.on_commit(lambda: payload_cache.invalidate([media.url]))
+    return contents
@@ -0,0 +1,55 @@
+"""Async data access for the Socket.IO server.
+
+Everything here is safe to await from the event loop: queries go through
+Django's async ORM API, and the few blocking calls that have no async
+equivalent run on a small dedicated thread pool instead of the loop.
+"""
+
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import payload_cache, scheduler, tasks
+from .models import BiasedMedia
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_DB_THREADS, thread_name_prefix="credibly-db"
+)
+
+
+def run_in_executor(func):
+    """Wrap a blocking function so awaiting it runs it on the bounded pool."""
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        # Pool threads outlive requests, so recycle their connections the
+        # way Django does at the start and end of each request.
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False, executor=_executor)
+
+
+async def get_media(url: str) -> BiasedMedia | None:
+    return await BiasedMedia.objects.for_url(url).afirst()
+
+
+async def get_completed(url: str) -> dict | None:
+    """Cached payload of a completed analysis, building it on a cache miss."""
+    entry = await payload_cache.aget(url)
+    if entry is None:
+        entry = await _get_completed(url)
+    return entry
+
+
+_get_completed = run_in_executor(payload_cache.get_completed)
+analyze_media = run_in_executor(tasks.analyze_media)
+start_fact_check = run_in_executor(tasks.start_fact_check)
+prefetch_media = run_in_executor(tasks.prefetch_media)
+queue_position = run_in_executor(scheduler.queue_position)
@@ -0,0 +1,124 @@
+"""Admission control and queue positions for video analyses.
+
+How many analyses run at once is capped by the Celery workers: each node runs
+``CELERY_WORKER_CONCURRENCY`` tasks and, with a prefetch multiplier of one,
+only takes a task off the broker when a slot is free. Everything else waits
+in the broker, which hands tasks out by priority (lower runs first), so a
+video someone is watching overtakes prefetch and re-score work. Only the
+first stage of a job waits at the job's priority; once it has been admitted,
+its later stages run at the top priority so it finishes before new jobs
+start.
+
+The broker can't say where a task is in its queue, so waiting jobs are
+mirrored in a Redis sorted set ordered the same way, and everyone waiting on
+a job is told its position whenever the queue moves. A more urgent request
+for a job that is still waiting promotes it (see ``tasks.analyze_media``).
+"""
+
+import functools
+import logging
+import time
+
+import redis
+from django.conf import settings
+
+from . import jobs, notify
+
+logger = logging.getLogger(__name__)
+
+# The priority the later stages of an admitted job run at.
+ADMITTED = 0
+
+_QUEUE = "analysis-queue"
+_URLS = "analysis-queue:urls"
+
+
+@functools.cache
+def _client() -> redis.Redis:
+    return redis.Redis.from_url(settings.ANALYSIS_QUEUE["redis_url"])
+
+
+def priority(name: str) -> int:
+    return settings.ANALYSIS_QUEUE["priorities"][name]
+
+
+def _score(job_priority: int) -> int:
+    # Milliseconds since the epoch stay below 10**13 for a few centuries, so
+    # jobs sort by priority first and then first come, first served.
+    return job_priority * 10**13 + time.time_ns() // 10**6
+
+
+def enqueue(key: str, url: str, job_priority: int) -> int:
+    """Record that the job for ``key`` is waiting; returns its position."""
+    with _client().pipeline() as pipe:
+        pipe.zadd(_QUEUE, {key: _score(job_priority)})
+        pipe.hset(_URLS, key, url)
+        pipe.zrank(_QUEUE, key)
+        *_, rank = pipe.execute()
+    return rank + 1
+
+
+def promote(key: str, job_priority: int) -> str | None:
+    """Move the job for ``key`` up to ``job_priority`` if it is still waiting
+    at a lower one; returns its URL if it was moved."""
+    with _client().pipeline() as pipe:
+        # XX only touches a job that's waiting, LT only ever moves it up.
+        pipe.zadd(_QUEUE, {key: _score(job_priority)}, xx=True, lt=True, ch=True)
+        pipe.hget(_URLS, key)
+        changed, url = pipe.execute()
+    if not changed or url is None:
+        return None
+    announce()
+    return url.decode()
+
+
+def position(key: str) -> int | None:
+    """1-based position of the job for ``key``, or None if it isn't waiting."""
+    rank = _client().zrank(_QUEUE, key)
+    return None if rank is None else rank + 1
+
+
+def waiting() -> int:
+    return _client().zcard(_QUEUE)
+
+
+def queue_position(url: str) -> int | None:
+    return position(jobs.media_key(url))
+
+
+def remove(key: str) -> None:
+    """Take the job for ``key`` out of the queue and update everyone behind it."""
+    with _client().pipeline() as pipe:
+        pipe.zrem(_QUEUE, key)
+        pipe.hdel(_URLS, key)
+        removed, _ = pipe.execute()
+    if removed:
+        announce()
+
+
+def announce() -> None:
+    """Publish the current position of each waiting job to its URL.
+
+    Jobs whose claim has expired (say, their worker died before starting
+    them) are dropped along the way.
+    """
+    client = _client()
+    limit = settings.ANALYSIS_QUEUE["announce_limit"]
+    keys = [key.decode() for key in client.zrange(_QUEUE, 0, limit - 1)]
+    if not keys:
+        return
+    urls = client.hmget(_URLS, keys)
+    stale, waiting = [], 0
+    for key, url in zip(keys, urls):
+        if url is None or jobs.current(key) is None:
+            stale.append(key)
+            continue
+        waiting += 1
+        url = url.decode()
+        notify.publish(url, "queued", {"url": url, "position": waiting})
+    if stale:
+        logger.info("Dropping %d stale jobs from the analysis queue", len(stale))
+        with client.pipeline() as pipe:
+            pipe.zrem(_QUEUE, *stale)
+            pipe.hdel(_URLS, *stale)
+            pipe.execute()
@@ -0,0 +1,225 @@
+"""Scoring how biased sentences are.
+
+A scorer takes a batch of sentences and returns one score between 0 and 1 per
+sentence as a NumPy array. The pipeline gets its scorer from the model
+registry, configured by ``settings.INFERENCE_MODELS["scorer"]``:
+
+* ``"textblob"`` scores each sentence with TextBlob's subjectivity, one
+  sentence at a time in pure Python.
+* ``"lexicon"`` computes the same subjectivity from TextBlob's own sentiment
+  lexicon for the whole batch at once with array operations. It follows
+  TextBlob's rules for modifiers ("very good") and negations ("not very
+  good"), but ignores emoticons, so scores can differ slightly on text that
+  uses them.
+"""
+
+import re
+from collections.abc import Sequence
+from importlib import resources
+from pathlib import Path
+from typing import Protocol
+from xml.etree import ElementTree
+
+import numpy as np
+
+NEGATIONS = ("no", "not", "never")
+
+# Tokenization follows TextBlob's: contractions are split off the word before
+# apostrophes and quotes are, so "don't" becomes "do", "n", "'", "t", and then
+# punctuation is split from the start and end of each word.
+_CONTRACTION = re.compile(r"(n't|'(?:d|m|s|ll|re|ve))")
+_QUOTE = re.compile("[\u201c\u201d\u2018\u2019'\"]")
+_PUNCTUATION = tuple(",;:!?()[]{}`'\"@#$^&*+-|=~_")
+_TRAILING = (*_PUNCTUATION, ".")
+_ABBREVIATION = re.compile(r"([a-z]\.)+")
+
+
+class Scorer(Protocol):
+    def score(self, sentences: Sequence[str]) -> np.ndarray: ...
+
+
+class TextBlobScorer:
+    def score(self, sentences: Sequence[str]) -> np.ndarray:
+        from textblob import TextBlob
+
+        return np.fromiter(
+            (TextBlob(sentence).sentiment.subjectivity for sentence in sentences),
+            dtype=np.float64,
+            count=len(sentences),
+        )
+
+
+def _average(values: list[tuple[float, ...]]) -> tuple[float, ...]:
+    return tuple(sum(column) / len(column) for column in zip(*values))
+
+
+def load_lexicon(path: str | Path | None = None) -> dict[str, dict[str | None, tuple]]:
+    """Read TextBlob's sentiment lexicon as ``{word: {pos: (p, s, i)}}``.
+
+    Mirrors how TextBlob loads it: senses are averaged per part of speech,
+    the ``None`` entry averages the parts of speech, and every adjective also
+    gets an adverb ("terrible" -> "terribly") with the same scores.
+    """
+    if path is None:
+        path = resources.files("textblob.en") / "en-sentiment.xml"
+    senses: dict[str, dict[str | None, list]] = {}
+    for word in ElementTree.parse(path).getroot().iter("word"):
+        form = word.get("form")
+        if form:
+            senses.setdefault(form, {}).setdefault(word.get("pos"), []).append(
+                (
+                    float(word.get("polarity", 0.0)),
+                    float(word.get("subjectivity", 0.0)),
+                    float(word.get("intensity", 1.0)),
+                )
+            )
+
+    lexicon = {
+        form: {pos: _average(values) for pos, values in by_pos.items()}
+        for form, by_pos in senses.items()
+    }
+    for by_pos in lexicon.values():
+        by_pos[None] = _average(list(by_pos.values()))
+
+    for form, by_pos in list(lexicon.items()):
+        if "JJ" in by_pos:
+            if form.endswith("y"):
+                form = form[:-1] + "i"
+            if form.endswith("le"):
+                form = form[:-2]
+            adverb = lexicon.setdefault(form + "ly", {})
+            adverb["RB"] = adverb[None] = by_pos["JJ"]
+    return lexicon
+
+
+def tokenize(sentence: str) -> list[str]:
+    text = _QUOTE.sub(r" \g<0> ", _CONTRACTION.sub(r" \1", sentence.lower()))
+    tokens = []
+    for word in text.split():
+        if word.isalnum():
+            tokens.append(word)
+            continue
+        while word.startswith(_PUNCTUATION):
+            tokens.append(word[0])
+            word = word[1:]
+        tail = []
+        while word.endswith(_TRAILING):
+            if word.endswith(_PUNCTUATION):
+                tail.append(word[-1])
+                word = word[:-1]
+            if word.endswith("..."):
+                tail.append("...")
+                word = word[:-3].rstrip(".")
+            if word.endswith("."):
+                if _ABBREVIATION.fullmatch(word):
+                    break
+                tail.append(".")
+                word = word[:-1]
+        if word:
+            tokens.append(word)
+        tokens.extend(reversed(tail))
+    return tokens
+
+
+class LexiconScorer:
+    """Vectorized equivalent of TextBlob's subjectivity score."""
+
+    def __init__(self, lexicon: dict[str, dict[str | None, tuple]] | None = None):
+        lexicon = load_lexicon() if lexicon is None else lexicon
+        words = sorted(set(lexicon) | set(NEGATIONS))
+        # Id 0 stands for every word that isn't in the vocabulary.
+        self.vocabulary = {word: i for i, word in enumerate(words, start=1)}
+        size = len(words) + 1
+        self.known = np.zeros(size, dtype=bool)
+        self.subjectivity = np.zeros(size)
+        self.intensity = np.ones(size)
+        self.modifier = np.zeros(size, dtype=bool)
+        self.adverb = np.zeros(size, dtype=bool)
+        self.negation = np.zeros(size, dtype=bool)
+        for word, i in self.vocabulary.items():
+            if word in lexicon:
+                _, subjectivity, intensity = lexicon[word][None]
+                self.known[i] = True
+                self.subjectivity[i] = subjectivity
+                self.intensity[i] = intensity
+                self.modifier[i] = "RB" in lexicon[word]
+                self.adverb[i] = word.endswith("ly")
+            self.negation[i] = word in NEGATIONS
+
+    def score(self, sentences: Sequence[str]) -> np.ndarray:
+        tokenized = [tokenize(sentence) for sentence in sentences]
+        counts = np.fromiter(map(len, tokenized), dtype=np.intp, count=len(sentences))
+        total = int(counts.sum())
+        scores = np.zeros(len(sentences))
+        if total == 0:
+            return scores
+
+        vocabulary = self.vocabulary
+        ids = np.fromiter(
+            (vocabulary.get(t, 0) for words in tokenized for t in words),
+            dtype=np.intp,
+            count=total,
+        )
+        lengths = np.fromiter(
+            (len(t) for words in tokenized for t in words), dtype=np.intp, count=total
+        )
+        rows = np.repeat(np.arange(len(sentences)), counts)
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        positions = np.arange(total)
+
+        def previous(mask: np.ndarray) -> np.ndarray:
+            """Index of the last token before each one where ``mask`` holds, or -1."""
+            last = np.maximum.accumulate(np.where(mask, positions, -1))
+            before = np.concatenate(([-1], last[:-1]))
+            before[before < starts] = -1
+            return before
+
+        known = self.known[ids]
+        modifier = known & self.modifier[ids]
+        negation = self.negation[ids]
+
+        # A known modifier applies to the next known word, across any short
+        # unknown words in between ("really is a good").
+        ends_modifier = known | (lengths > 2)
+        # ... and a negation right after an -ly modifier is folded into the
+        # modifier instead of ending it ("really not good"). Each fold can
+        # expose another negation to the modifier, so repeat until stable.
+        adverb = modifier & self.adverb[ids]
+        folded = np.zeros(total, dtype=bool)
+        while True:
+            before = previous(ends_modifier & ~folded)
+            folds = negation & ~known & (before >= 0) & adverb[before]
+            if np.array_equal(folds, folded):
+                break
+            folded = folds
+        modified_by = np.where((before >= 0) & modifier[before] & known, before, -1)
+        modified = modified_by >= 0
+
+        # A negation flips the intensity of the next known word, across any
+        # one-letter words in between ("not a good").
+        before = previous(known | negation | (lengths > 1))
+        negated = known & (before >= 0) & negation[before] & ~folded[before]
+
+        intensity = self.intensity[ids]
+        intensity = np.where(negated, 1 / intensity, intensity)
+        values = self.subjectivity[ids]
+        values[modified] = np.clip(
+            values[modified] * intensity[modified_by[modified]], -1.0, 1.0
+        )
+
+        # A run of modifiers and the word they modify count as one assessment,
+        # scored by its last word.
+        modifies_next = np.zeros(total, dtype=bool)
+        modifies_next[modified_by[modified]] = True
+        last = known & ~modifies_next
+        first = known & ~modified
+        sums = np.bincount(rows[last], weights=values[last], minlength=len(sentences))
+        assessed = np.bincount(rows[first], minlength=len(sentences))
+        np.divide(sums, assessed, out=scores, where=assessed > 0)
+        return scores
+
+
+SCORERS = {
+    "textblob": TextBlobScorer,
+    "lexicon": LexiconScorer,
+}
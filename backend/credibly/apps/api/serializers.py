@@ -1,6 +1,6 @@
 from rest_framework import serializers
 
-from .models import BiasedContent, BiasedMedia, ContentCreator
+from .models import BiasedContent, BiasedMedia, ContentCreator, CreatorScore
 
 
 class BiasedContentSerializer(serializers.ModelSerializer):
@@ -14,15 +14,26 @@ class BiasedContentSerializer(serializers.ModelSerializer):
 
 
 class BiasedMediaSerializer(serializers.ModelSerializer):
+    """Full media payload. Use ``BiasedMedia.objects.with_content()`` to avoid
+    a query per related object, or ``payloads.media_payload`` on hot paths."""
+
     biased_content = BiasedContentSerializer(many=True)
+    creator = serializers.StringRelatedField()
 
     class Meta:
         model = BiasedMedia
-        fields = ["name", "url", "complete", "biased_content", "content_creators"]
-
+        fields = ["name", "url", "complete", "biased_content", "creator"]
 
 
 class ContentCreatorSerializer(serializers.ModelSerializer):
     class Meta:
         model = ContentCreator
         fields = ["name"]
+
+
+class CreatorScoreSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source="creator.name")
+
+    class Meta:
+        model = CreatorScore
+        fields = ["name", "avg_accuracy", "scored_count"]
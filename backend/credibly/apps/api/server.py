@@ -1,23 +1,20 @@
-import os
-import contextlib
-import tempfile
-from collections.abc import Iterator
+import asyncio
+import functools
 
 import socketio
-from textblob import TextBlob
-import whisper
-import moviepy
-import yt_dlp
-import easyocr
-import cv2
+from channels.layers import get_channel_layer
 from django.conf import settings
 from django.core.asgi import get_asgi_application
 
-from .models import BiasedContent, BiasedMedia
-from .serializers import BiasedContentSerializer, BiasedMediaSerializer
+from . import notify, repository
 
-# Initialize Socket.io server with explicit path
-sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+# Initialize Socket.io server with explicit path. Rooms are shared between
+# server processes through Redis, so any of them can emit to any client.
+sio = socketio.AsyncServer(
+    async_mode='asgi',
+    cors_allowed_origins='*',
+    client_manager=socketio.AsyncRedisManager(settings.SOCKETIO_REDIS_URL),
+)
 # Mount the Socket.io server at the root path
 django_app = get_asgi_application()
 app = socketio.ASGIApp(
@@ -26,10 +23,6 @@ app = socketio.ASGIApp(
     socketio_path='socket.io'  # Explicitly set the Socket.io path
 )
 
-# Initialize models
-reader = easyocr.Reader(["en"])
-audio_model = whisper.load_model("tiny")
-
 @sio.event
 async def connect(sid, environ):
     print(f"Client connected: {sid}")
@@ -49,65 +42,37 @@ async def join(sid, data):
         await sio.enter_room(sid, url)
         
         # Check if we already have analysis for this URL
-        media = BiasedMedia.objects.filter(url=url).first()
-        if media is not None and media.complete:
+        entry = await repository.get_completed(url)
+        if entry is not None:
             # Send existing analysis
-            await send_existing_analysis(sid, media)
+            await send_existing_analysis(sid, url, entry)
         else:
             # Start new analysis
-            await sio.emit('analysisStarted', {'status': 'Processing started'}, room=sid)
             await process_media(sid, url)
 
-async def send_existing_analysis(sid, media):
+async def send_existing_analysis(sid, url, entry):
     """Send existing analysis to client"""
-    media_content = media.biased_content.all()
-    
-    # Calculate average bias strength
-    total_bias = 0
-    count = 0
-    for content in media_content:
-        total_bias += content.bias_strength
-        count += 1
-    
-    avg_bias = total_bias / count if count > 0 else 0
-    
     # Send credibility update
     await sio.emit('credibilityUpdate', {
-        'bias_strength': avg_bias,
-        'url': media.url
+        'bias_strength': entry['average_bias'],
+        'url': url
     }, room=sid)
 
 async def process_media(sid, url):
-    """Process media content and analyze for bias"""
+    """Queue analysis of the media and forward its results to the URL's room"""
     try:
-        # Extract name from URL
-        name = url.split('/')[-1] if '/' in url else url
-        
-        # Check if media already exists
-        media = BiasedMedia.objects.filter(url=url).first()
-        if media is None:
-            media = BiasedMedia.objects.create(url=url, name=name)
-        
-        # Process video if it's a TikTok URL
         if 'tiktok.com' in url:
-            audio_text, video_text = await process_video(url)
-            
-            # Analyze text for bias
-            bias_results = await analyze_bias(audio_text, media)
-            
-            # Calculate average bias
-            total_bias = sum(content.bias_strength for content in bias_results)
-            avg_bias = total_bias / len(bias_results) if bias_results else 0
-            
-            # Send results to client
-            await sio.emit('credibilityUpdate', {
-                'bias_strength': avg_bias,
+            # Extract name from URL
+            name = url.split('/')[-1] if '/' in url else url
+            await listen_for_results(url)
+            await repository.analyze_media(url, name)
+            # Position in the queue, or None if the analysis is already running
+            position = await repository.queue_position(url)
+            await sio.emit('analysisStarted', {
+                'status': 'Queued' if position else 'Processing started',
+                'position': position,
                 'url': url
-            }, room=url)
-            
-            # Mark as complete
-            media.complete = True
-            media.save()
+            }, room=sid)
         else:
             # For non-video URLs, use a simpler analysis
             await sio.emit('credibilityUpdate', {
@@ -118,80 +83,88 @@ async def process_media(sid, url):
         print(f"Error processing media: {e}")
         await sio.emit('error', {'message': str(e)}, room=sid)
 
-async def process_video(url):
-    """Process video content to extract text"""
-    print("Starting video processing")
-    
-    # Create temporary files
-    temp_video = os.path.join(tempfile.gettempdir(), f"video_{url.split('/')[-1]}") + ".mp4"
-    
+# Pipeline events relayed by each kind of listener, and the ones that end it
+LISTENER_EVENTS = {
+    'analysis': ({'queued', 'progress', 'content', 'result', 'error'}, {'result', 'error'}),
+    'fact_check': (
+        {'verdict', 'fact_check_complete', 'fact_check_error'},
+        {'fact_check_complete', 'fact_check_error'},
+    ),
+}
+
+# (URL, kind) -> task relaying that kind of pipeline event for the URL
+_listeners: dict[tuple[str, str], asyncio.Task] = {}
+
+async def listen_for_results(url, kind='analysis'):
+    """Start relaying pipeline events for the URL to its room, if not already"""
+    if (url, kind) in _listeners:
+        return
+    layer = get_channel_layer()
+    channel = await layer.new_channel()
+    # Subscribe before returning so nothing published after this is missed
+    await layer.group_add(notify.group_for(url), channel)
+    if (url, kind) in _listeners:
+        await layer.group_discard(notify.group_for(url), channel)
+        return
+    _listeners[url, kind] = asyncio.create_task(
+        forward_media_events(url, kind, channel)
+    )
+
+async def forward_media_events(url, kind, channel):
+    layer = get_channel_layer()
+    relayed, final = LISTENER_EVENTS[kind]
     try:
-        # Download video
-        with yt_dlp.YoutubeDL({"outtmpl": temp_video}) as ydl:
-            ydl.extract_info(url, download=True)
-        
-        print("Extracted video info")
-        encoded_video = moviepy.VideoFileClip(temp_video)
-        temp_audio = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
-        encoded_video.audio.write_audiofile(temp_audio.name)
-        
-        print("Transcribing")
-        with contextlib.redirect_stdout(None):
-            # Transcribe audio
-            transcribed_audio = audio_model.transcribe(temp_audio.name)
-            
-            lines = []
-            for segment in transcribed_audio['segments']:
-                time_duration = segment['end'] - segment['start']
-                lines.append(f"{time_duration:.2f}s: {segment['text'].strip()}")
-            
-            audio_text = "\n".join(lines)
-            
-            # Extract text from video frames
-            video_text = {}
-            for t in range(0, encoded_video.n_frames, int(encoded_video.fps)):
-                frame = encoded_video.get_frame(t)
-                frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-                
-                results = reader.readtext(frame, detail=0)
-                if results:
-                    video_text[t / int(encoded_video.fps)] = results
-            
-            video_text_str = "\n".join([f"{time}: {line}" for time, line in video_text.items()])
-        
-        # Clean up
-        temp_audio.close()
-        os.remove(temp_audio.name)
-        os.remove(temp_video)
-        
-        return audio_text, video_text_str
-    
-    except Exception as e:
-        print(f"Error processing video: {e}")
-        # Clean up in case of error
-        if os.path.exists(temp_video):
-            os.remove(temp_video)
-        return "", ""
-
-async def analyze_bias(text: str, media: BiasedMedia) -> list:
-    """Analyze text for bias using TextBlob"""
-    print("Analyzing text for bias")
-    results = []
-    
-    if not text:
-        return results
-    
-    blob = TextBlob(text)
-    for sentence in blob.sentences:
-        content = BiasedContent.objects.create(
-            media=media,
-            content=sentence.raw,
-            bias_strength=sentence.sentiment.subjectivity,
-            accuracy=None,
-        )
-        results.append(content)
-    
-    return results
+        while True:
+            message = await layer.receive(channel)
+            event, data = message['event'], message['data']
+            if event not in relayed:
+                continue
+            await emit_media_event(url, event, data)
+            if event in final:
+                break
+    finally:
+        await layer.group_discard(notify.group_for(url), channel)
+        _listeners.pop((url, kind), None)
+
+async def emit_media_event(url, event, data):
+    """Translate a pipeline event into Socket.IO events for the URL's room
+
+    Every server process with clients in the room runs its own listener, so
+    each one only emits to its own clients rather than through the manager,
+    which would deliver the event once per listening process.
+    """
+    emit = functools.partial(sio.emit, room=url, ignore_queue=True)
+    if event == 'content':
+        # Partial score while the rest of the video is processed
+        await emit('contentScored', data)
+        await emit('credibilityUpdate', {
+            'bias_strength': data['average_bias'],
+            'url': url,
+            'partial': True
+        })
+    elif event == 'result':
+        await emit('credibilityUpdate', {
+            'bias_strength': data['average_bias'],
+            'url': url
+        })
+    elif event == 'queued':
+        # The queue moved; tell the room where its analysis now stands
+        await emit('analysisStarted', {
+            'status': 'Queued',
+            'position': data['position'],
+            'url': url
+        })
+    elif event in ('error', 'fact_check_error'):
+        await emit('error', {'message': data['message']})
+    elif event == 'verdict':
+        await emit('factCheckVerdict', data)
+    elif event == 'fact_check_complete':
+        await emit('factCheckComplete', {
+            'average_misinformation': data['average_misinformation'],
+            'url': url
+        })
+    else:
+        await emit('analysisProgress', data)
 
 @sio.event
 async def analysis(sid, data):
@@ -199,4 +172,29 @@ async def analysis(sid, data):
     print(f"Analysis event received: {data}")
     if 'url' in data:
         url = data['url']
-        await process_media(sid, url) 
\ No newline at end of file
+        await process_media(sid, url) 
+
+@sio.event
+async def factCheck(sid, data):
+    """Fact-check the statements of an analyzed URL, streaming verdicts"""
+    print(f"Fact check event received: {data}")
+    if 'url' in data:
+        url = data['url']
+        await sio.enter_room(sid, url)
+        media = await repository.get_media(url)
+        if media is None or not media.complete:
+            await sio.emit('error', {'message': 'Media has not been analyzed yet'}, room=sid)
+            return
+        await listen_for_results(url, 'fact_check')
+        job_id = await repository.start_fact_check(media)
+        await sio.emit('factCheckStarted', {'job_id': job_id, 'url': url}, room=sid)
+
+@sio.event
+async def prefetch(sid, data):
+    """Queue background analyses of videos the client is likely to open next"""
+    urls = data.get('urls') if isinstance(data, dict) else None
+    if not isinstance(urls, list) or not all(isinstance(url, str) for url in urls):
+        await sio.emit('error', {'message': 'Expected a list of URLs as "urls"'}, room=sid)
+        return
+    outcome = await repository.prefetch_media(urls)
+    await sio.emit('prefetchQueued', outcome, room=sid)
@@ -1,17 +1,325 @@
-from typing import Annotated
+from celery import Task, chain, chord, group, shared_task
+from celery.exceptions import Ignore
+from celery.utils import uuid
+from celery.signals import worker_process_init
+from django.conf import settings
 
-from celery import shared_task
-from pydantic import BaseModel, Field
-from google import genai
-from google.genai import types
-from pydantic_core import from_json
+from . import (
+    factcheck,
+    jobs,
+    media_cache,
+    model_registry,
+    notify,
+    payloads,
+    pipeline,
+    scheduler,
+)
+from .models import BiasedMedia, ContentCreator
 
-from .models import BiasedContent
 
+@worker_process_init.connect
+def warm_models(**kwargs):
+    model_registry.warmup()
 
 
-type zero_to_one = Annotated[float, Field(ge=0, le=1)]
+class PipelineTask(Task):
+    """Base for the pipeline stages, which all take the job dict (or, for the
+    step after a chord, a list of them) first.
 
-class CheckBSResponse(BaseModel):
-    misinformation_amount: zero_to_one
-    certainity: zero_to_one
+    If a stage fails, the rest of the chain is skipped, so release the job and
+    tell whoever is waiting on the URL here.
+    """
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        job = args[0] if args else None
+        if isinstance(job, list) and job:
+            job = job[0]
+        if not isinstance(job, dict):
+            return
+        jobs.release(job["key"])
+        scheduler.remove(job["key"])
+        notify.publish(job["url"], "error", {"url": job["url"], "message": str(exc)})
+
+
+@shared_task(base=PipelineTask)
+def fetch_media(job: dict) -> dict:
+    if not _owns_job(job):
+        raise Ignore()
+    scheduler.remove(job["key"])
+    notify.publish(job["url"], "progress", {"url": job["url"], "stage": "downloading"})
+    # Later stages fetch the media again by id, which is a cache hit on this
+    # node and a fresh download if they end up on another one.
+    cached = media_cache.fetch(job["url"])
+    job["video_id"] = cached.video_id
+    if cached.uploader:
+        _set_creator(job["media_id"], cached.uploader)
+    return job
+
+
+def _owns_job(job: dict) -> bool:
+    """Whether this message is still the one that should run ``job``.
+
+    A job resubmitted at a higher priority leaves its old message in the
+    broker; by the time that comes up the new copy may be running, or may
+    have finished and released the claim. Either way the old one must not
+    analyze the video again, which would throw away any fact-check results
+    recorded since.
+    """
+    running = jobs.current(job["key"])
+    if running is not None:
+        return running == job["task_id"]
+    # The claim has expired or been released: only carry on if nobody has
+    # finished the job in the meantime and nobody else claims it first.
+    if BiasedMedia.objects.filter(pk=job["media_id"], complete=True).exists():
+        return False
+    return jobs.claim(job["key"], job["task_id"])
+
+
+def _set_creator(media_id: int, name: str) -> None:
+    creator = ContentCreator.objects.filter(name=name).first()
+    if creator is None:
+        creator = ContentCreator.objects.create(name=name)
+    BiasedMedia.objects.filter(pk=media_id, creator=None).update(creator=creator)
+
+
+def _stream_scores(job: dict, source: str, scores: list, **extra) -> None:
+    """Publish freshly scored sentences along with the running average."""
+    if not settings.ANALYSIS_STREAMING:
+        return
+    for sentence, bias_strength in scores:
+        notify.publish(
+            job["url"],
+            "content",
+            {
+                "url": job["url"],
+                "source": source,
+                "content": sentence,
+                "accuracy": None,
+                "bias_strength": bias_strength,
+                "average_bias": jobs.add_running_score(job["key"], bias_strength),
+                **extra,
+            },
+        )
+
+
+@shared_task(base=PipelineTask)
+def transcribe_media(job: dict) -> dict:
+    notify.publish(job["url"], "progress", {"url": job["url"], "stage": "transcribing"})
+    scores = []
+
+    def on_segment(segment):
+        segment_scores = pipeline.score_segment(segment)
+        scores.extend(segment_scores)
+        _stream_scores(
+            job, "audio", segment_scores, start=segment["start"], end=segment["end"]
+        )
+
+    media = media_cache.fetch(job["url"], job["video_id"])
+    pipeline.transcribe_audio(media.audio_path, on_segment)
+    job["audio_scores"] = scores
+    return job
+
+
+@shared_task(base=PipelineTask)
+def read_frames(job: dict) -> dict:
+    notify.publish(job["url"], "progress", {"url": job["url"], "stage": "reading frames"})
+    scores = []
+
+    def on_frame(timestamp, lines):
+        frame_scores = pipeline.score_frame(lines)
+        scores.extend(frame_scores)
+        _stream_scores(job, "video", frame_scores, start=timestamp)
+
+    media = media_cache.fetch(job["url"], job["video_id"])
+    pipeline.extract_frame_text(media.video_path, on_frame)
+    job["video_scores"] = scores
+    return job
+
+
+@shared_task(base=PipelineTask)
+def score_media(branches: list[dict]) -> dict:
+    # The transcription and OCR branches each return their own copy of the job.
+    job = {key: value for branch in branches for key, value in branch.items()}
+    notify.publish(job["url"], "progress", {"url": job["url"], "stage": "saving"})
+    media = BiasedMedia.objects.get(pk=job["media_id"])
+    contents = pipeline.save_analysis(media, job["audio_scores"] + job["video_scores"])
+    jobs.release(job["key"])
+
+    result = _result(job["url"], media, contents)
+    notify.publish(job["url"], "result", result)
+    return result
+
+
+def _result(url: str, media: BiasedMedia, contents) -> dict:
+    return {
+        "url": url,
+        "average_bias": media.bias_mean,
+        "contents": [payloads.content_payload(c) for c in contents],
+    }
+
+
+def analyze_media(url: str, name: str, priority: str = "interactive") -> str | None:
+    """Queue the analysis of ``url`` and return the id of its job.
+
+    If the same video is already being analyzed, nothing new is queued and
+    the running job's id is returned instead; its results are published to
+    every URL for that video. ``priority`` names one of
+    ``settings.ANALYSIS_QUEUE["priorities"]`` and decides when the job is
+    admitted (see ``scheduler``). A job that is still waiting at a lower
+    priority is promoted to this one.
+    """
+    key = jobs.media_key(url)
+    task_id = uuid()
+    job_priority = scheduler.priority(priority)
+    while not jobs.claim(key, task_id):
+        if (running := jobs.current(key)) is not None:
+            return _promote(key, job_priority) or running
+
+    media, _ = BiasedMedia.objects.get_or_create(
+        media_key=key, defaults={"url": url, "name": name}
+    )
+    if media.complete:
+        # Another job finished between the caller's check and our claim.
+        jobs.release(key)
+        notify.publish(url, "result", _result(url, media, media.biased_content.all()))
+        return None
+
+    scheduler.enqueue(key, url, job_priority)
+    _submit({"url": url, "key": key, "media_id": media.pk, "task_id": task_id}, job_priority)
+    return task_id
+
+
+def _promote(key: str, job_priority: int) -> str | None:
+    """Resubmit the waiting job for ``key`` at ``job_priority``.
+
+    The broker can't reprioritize a message it already holds, so the job is
+    submitted again under a new id that takes over its claim, and the old
+    message is dropped by :func:`fetch_media` when it comes up. Returns the
+    new id, or None if the job isn't waiting at a lower priority.
+    """
+    url = scheduler.promote(key, job_priority)
+    if url is None:
+        return None
+    task_id = uuid()
+    # Should the old message be admitted before the claim moves over, both
+    # copies run; the video is analyzed twice rather than not at all.
+    jobs.reassign(key, task_id)
+    media = BiasedMedia.objects.get(media_key=key)
+    _submit({"url": url, "key": key, "media_id": media.pk, "task_id": task_id}, job_priority)
+    return task_id
+
+
+def _submit(job: dict, job_priority: int) -> None:
+    admitted = {"priority": scheduler.ADMITTED}
+    # Transcription and OCR don't depend on each other, so they run side by
+    # side and the scoring step waits for both.
+    chain(
+        fetch_media.s(job).set(priority=job_priority),
+        chord(
+            group(transcribe_media.s().set(**admitted), read_frames.s().set(**admitted)),
+            score_media.s().set(**admitted),
+        ),
+    ).apply_async(task_id=job["task_id"])
+
+
+def prefetch_media(urls: list[str]) -> dict[str, list[str]]:
+    """Queue low-priority analyses of videos the user is likely to open next.
+
+    Only video URLs are accepted, at most ``ANALYSIS_QUEUE["prefetch_limit"]``
+    of them, and each video is only considered once. Videos that are already
+    analyzed or being analyzed are left alone, and nothing is queued while
+    more than ``ANALYSIS_QUEUE["prefetch_max_waiting"]`` jobs are waiting, so
+    prefetching never piles onto an overloaded queue. Returns the URLs
+    grouped by what happened to them.
+    """
+    options = settings.ANALYSIS_QUEUE
+    outcome: dict[str, list[str]] = {
+        "queued": [],
+        "known": [],
+        "in_progress": [],
+        "deferred": [],
+        "unsupported": [],
+    }
+    by_key: dict[str, str] = {}
+    for url in urls[: options["prefetch_limit"]]:
+        if jobs.video_id(url) is None:
+            outcome["unsupported"].append(url)
+        else:
+            by_key.setdefault(jobs.media_key(url), url)
+
+    known = set(
+        BiasedMedia.objects.filter(media_key__in=by_key, complete=True).values_list(
+            "media_key", flat=True
+        )
+    )
+    room = options["prefetch_max_waiting"] - scheduler.waiting()
+    for key, url in by_key.items():
+        if key in known:
+            outcome["known"].append(url)
+        elif jobs.current(key) is not None:
+            outcome["in_progress"].append(url)
+        elif room <= 0:
+            outcome["deferred"].append(url)
+        else:
+            analyze_media(url, url.rstrip("/").rsplit("/", 1)[-1], priority="prefetch")
+            outcome["queued"].append(url)
+            room -= 1
+    return outcome
+
+
+def _fact_check_key(url: str) -> str:
+    return f"fact-check:{jobs.media_key(url)}"
+
+
+def _verdict(content) -> dict:
+    return {
+        "content": content.content,
+        "accuracy": content.accuracy,
+        "accuracy_certainty": content.accuracy_certainty,
+        "bias_strength": content.bias_strength,
+    }
+
+
+@shared_task
+def fact_check_media(media_id: int) -> dict:
+    media = BiasedMedia.objects.get(pk=media_id)
+    url = media.url
+
+    def on_checked(contents):
+        for content in contents:
+            notify.publish(url, "verdict", {"url": url, **_verdict(content)})
+
+    try:
+        contents = factcheck.fact_check_contents(
+            list(media.biased_content.all()), on_checked
+        )
+    except Exception as exc:
+        notify.publish(url, "fact_check_error", {"url": url, "message": str(exc)})
+        raise
+    finally:
+        jobs.release(_fact_check_key(url))
+
+    media.refresh_from_db()
+    result = {
+        "url": url,
+        "contents": [payloads.content_payload(c) for c in contents],
+        "average_misinformation": media.average_misinformation,
+    }
+    notify.publish(url, "fact_check_complete", result)
+    return result
+
+
+def start_fact_check(media: BiasedMedia) -> str:
+    """Queue fact-checking of ``media``'s statements and return the job id.
+
+    Like :func:`analyze_media`, a media item already being checked isn't
+    queued twice; the running job's id is returned instead.
+    """
+    key = _fact_check_key(media.url)
+    task_id = uuid()
+    while not jobs.claim(key, task_id):
+        if (running := jobs.current(key)) is not None:
+            return running
+    jobs.record_queued(task_id)
+    fact_check_media.apply_async((media.pk,), task_id=task_id)
+    return task_id
@@ -1,3 +1,945 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock, skipUnless
+
+import cv2
+import numpy as np
+import redis
+import socketio
+from asgiref.sync import async_to_sync
+from celery.exceptions import Ignore
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import run_checks
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from . import factcheck, jobs, media_cache, ocr, payload_cache, pipeline, scheduler, tasks
+from .audio import SAMPLE_RATE, JoinedRegions, speech_regions
+from .factcheck import FactChecker, TokenBucket, claim_hash, normalize_claim
+from .frames import KeyframeFilter
+from .models import BiasedContent, BiasedMedia
+from .scoring import LexiconScorer, TextBlobScorer
+
+
+class SettingsChecksTests(SimpleTestCase):
+    @override_settings(
+        CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+    )
+    def test_in_memory_channel_layer_warns(self):
+        self.assertIn("api.W001", [check.id for check in run_checks()])
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    )
+    def test_per_process_default_cache_warns(self):
+        self.assertIn("api.W002", [check.id for check in run_checks()])
+
+    def test_shared_settings_pass(self):
+        self.assertEqual([check.id for check in run_checks()], [])
+
+
+def caption_frame(caption: str, noise_seed: int | None = None) -> np.ndarray:
+    """A static RGB scene with ``caption`` burned in near the bottom."""
+    frame = np.full((640, 360, 3), (40, 90, 140), dtype=np.uint8)
+    cv2.circle(frame, (180, 250), 80, (200, 200, 60), -1)
+    if caption:
+        cv2.putText(
+            frame, caption, (20, 560), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 255, 255), 2
+        )
+    if noise_seed is not None:
+        noise = np.random.default_rng(noise_seed).normal(0, 4, frame.shape)
+        frame = np.clip(frame + noise, 0, 255).astype(np.uint8)
+    return frame
+
+
+def talking_head(seconds: float, caption: str, shift: int = 0) -> np.ndarray:
+    """A presenter bobbing, blinking and talking above a burned-in caption."""
+    frame = np.full((640, 360, 3), (70, 80, 95), dtype=np.uint8)
+    cv2.rectangle(frame, (0, 420), (360, 640), (50, 60, 90), -1)
+    x = 180 + round(12 * np.sin(2 * np.pi * seconds / 7))
+    y = 250 + round(6 * np.sin(2 * np.pi * seconds / 3.1))
+    cv2.ellipse(frame, (x, y + 170), (130, 60), 0, 180, 360, (40, 40, 120), -1)
+    cv2.ellipse(frame, (x, y), (75, 100), 0, 0, 360, (150, 175, 215), -1)
+    cv2.ellipse(frame, (x, y - 55), (82, 60), 0, 180, 360, (30, 30, 40), -1)
+    for strand in range(6):
+        start, end = (x - 70 + 25 * strand, y - 105), (x - 60 + 25 * strand, y - 60)
+        cv2.line(frame, start, end, (20, 20, 25), 2)
+    for eye in (x - 28, x + 28):
+        if seconds % 4 < 0.2:
+            cv2.line(frame, (eye - 10, y - 15), (eye + 10, y - 15), (40, 40, 40), 2)
+        else:
+            cv2.circle(frame, (eye, y - 15), 7, (40, 40, 40), -1)
+    mouth = round(4 + 10 * abs(np.sin(2 * np.pi * seconds * 1.7)))
+    cv2.ellipse(frame, (x, y + 50), (22, mouth), 0, 0, 360, (60, 40, 120), -1)
+    cv2.putText(
+        frame, caption, (20 + shift, 560 + shift), cv2.FONT_HERSHEY_SIMPLEX, 0.9,
+        (255, 255, 255), 2,
+    )
+    noise = np.random.default_rng(round(seconds * 100)).normal(0, 3, frame.shape)
+    return np.clip(frame + noise, 0, 255).astype(np.uint8)
+
+
+class KeyframeFilterTests(SimpleTestCase):
+    def test_caption_changing_in_place_is_read(self):
+        keyframes = KeyframeFilter()
+        captions = ["Vaccines cause", "the moon is fake", "Drink more water"]
+        self.assertTrue(keyframes.accept(caption_frame("")))
+        for caption in captions:
+            with self.subTest(caption=caption):
+                self.assertTrue(keyframes.accept(caption_frame(caption)))
+
+    def test_moving_subject_under_a_static_caption_is_read_once(self):
+        keyframes = KeyframeFilter()
+        accepted = [
+            i for i in range(120) if keyframes.accept(talking_head(i / 2, "Drink more water"))
+        ]
+        self.assertEqual(accepted, [0])
+
+    def test_captions_changing_over_a_moving_subject_are_read(self):
+        captions = ["Drink more water", "the moon is fake", "Drink more soda"]
+        keyframes = KeyframeFilter()
+        accepted = [
+            i
+            for i in range(60)
+            if keyframes.accept(talking_head(i / 2, captions[i // 10 % 3], shift=i % 3))
+        ]
+        self.assertEqual(accepted, [0, 10, 20, 30, 40, 50])
+
+    def test_repeated_frames_are_skipped(self):
+        keyframes = KeyframeFilter()
+        self.assertTrue(keyframes.accept(caption_frame("Drink more water", 0)))
+        for seed in range(1, 4):
+            self.assertFalse(keyframes.accept(caption_frame("Drink more water", seed)))
+
+
+type Reply = tuple[int, str]
+
+
+class ReadInPoolTests(SimpleTestCase):
+    def test_batches_are_submitted_as_results_are_taken(self):
+        taken = 0
+        outstanding = []
+
+        def batches():
+            for i in range(20):
+                outstanding.append(i + 1 - taken)
+                yield [float(i)], [np.zeros((1, 1, 3), np.uint8)]
+
+        def read(frames, batch_size):
+            return [["text"]] * len(frames)
+
+        with (
+            ThreadPoolExecutor(2) as pool,
+            mock.patch.object(ocr, "_read_batch_in_process", read),
+        ):
+            results = []
+            for result in ocr._read_in_pool(pool, batches(), 1, 4):
+                results.append(result)
+                taken += 1
+        self.assertEqual([t for t, _ in results], [[float(i)] for i in range(20)])
+        self.assertLessEqual(max(outstanding), 4)
+
+
+class FakeYoutubeDL:
+    def __init__(self, options):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def extract_info(self, url, download):
+        return {"id": "7401", "title": "A video", "uploader": "someone"}
+
+
+class MediaCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = directory.name
+        cache_settings = override_settings(
+            MEDIA_CACHE={
+                "dir": self.dir,
+                "max_bytes": 1024**3,
+                "audio_format": "bestaudio",
+                "video_format": "worst",
+            }
+        )
+        cache_settings.enable()
+        self.addCleanup(cache_settings.disable)
+        self.downloads = []
+        patcher = mock.patch.object(media_cache.yt_dlp, "YoutubeDL", FakeYoutubeDL)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def download(self, info, format_spec):
+        self.downloads.append(format_spec)
+        path = f"{self.dir}/{info['id']}.{len(self.downloads)}.mp4"
+        # Slow enough for the other thread to miss the cache meanwhile.
+        time.sleep(0.1)
+        with open(path, "wb") as file:
+            file.write(b"media")
+        return path
+
+    def test_concurrent_fetches_download_once(self):
+        results = []
+        with mock.patch.object(media_cache, "_download", self.download):
+            threads = [
+                threading.Thread(
+                    target=lambda: results.append(media_cache.fetch("https://v/7401"))
+                )
+                for _ in range(2)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(self.downloads), 2)  # one video and one audio stream
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(media_cache.lookup("7401"), results[0])
+        # Only the entry itself, not lock or temporary files, counts as cached.
+        self.assertEqual(
+            sorted(path.name for path in media_cache._entry_files("7401")),
+            ["7401.1.mp4", "7401.2.mp4", "7401.json"],
+        )
+
+
+def verdicts_for(prompt: str) -> list[dict]:
+    """Verdicts for each statement in ``prompt``, scored by its trailing number."""
+    return [
+        {
+            "index": int(index),
+            "misinformation_amount": int(number) / 10,
+            "certainity": 0.9,
+        }
+        for index, number in re.findall(r"^(\d+): '.*?(\d+)'$", prompt, re.MULTILINE)
+    ]
+
+
+def error(code: int, status: str) -> Reply:
+    return code, json.dumps({"error": {"code": code, "message": status, "status": status}})
+
+
+class FakeGemini:
+    """A local stand-in for the Gemini ``generateContent`` endpoint.
+
+    Each request is answered by the next of ``replies`` (with the prompt),
+    or by ``reply`` once they run out. A reply is an HTTP status and, for
+    200, the text the model answers with; otherwise the response body.
+    """
+
+    def __init__(self, reply: Callable[[str], Reply] | None = None, replies=()):
+        self.reply = reply or (lambda prompt: (200, json.dumps(verdicts_for(prompt))))
+        self.replies = list(replies)
+        self.prompts: list[str] = []
+        self.times: list[float] = []
+        self.lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                prompt = body["contents"][0]["parts"][0]["text"]
+                status, text = fake.respond(self.path, prompt)
+                if status == 200:
+                    content = {"role": "model", "parts": [{"text": text}]}
+                    text = json.dumps({"candidates": [{"content": content}]})
+                data = text.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+
+    def respond(self, path: str, prompt: str) -> Reply:
+        if not path.endswith("/models/fake-model:generateContent"):
+            return error(404, "NOT_FOUND")
+        with self.lock:
+            self.prompts.append(prompt)
+            self.times.append(time.monotonic())
+            reply = self.replies.pop(0) if self.replies else self.reply
+        return reply(prompt) if callable(reply) else reply
+
+    def checker(self, **options) -> FactChecker:
+        return FactChecker(
+            {
+                "api_key": "test",
+                "base_url": f"http://127.0.0.1:{self.server.server_port}",
+                "model": "fake-model",
+                "batch_size": 3,
+                "max_concurrency": 2,
+                "requests_per_minute": 60_000,
+                "burst": 100,
+                "max_retries": 2,
+                "backoff": 0,
+                **options,
+            }
+        )
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+STATEMENTS = [f"statement number {i}" for i in range(7)]
+
+
+class FactCheckerTests(SimpleTestCase):
+    def assertVerdicts(self, verdicts, expected):
+        self.assertEqual(
+            [None if v is None else v.misinformation_amount for v in verdicts], expected
+        )
+
+    def test_batches_are_mapped_back_by_index(self):
+        def shuffled(prompt):
+            # Out of order, and with an index the batch doesn't have.
+            items = verdicts_for(prompt)[::-1]
+            items.append({"index": 7, "misinformation_amount": 1, "certainity": 1})
+            return 200, json.dumps(items)
+
+        with FakeGemini(shuffled) as gemini:
+            batches = []
+            verdicts = gemini.checker().check(
+                STATEMENTS, lambda start, results: batches.append((start, len(results)))
+            )
+        self.assertVerdicts(verdicts, [i / 10 for i in range(7)])
+        self.assertEqual(sorted(batches), [(0, 3), (3, 3), (6, 1)])
+        self.assertEqual(
+            sorted(len(verdicts_for(prompt)) for prompt in gemini.prompts), [1, 3, 3]
+        )
+
+    def test_fenced_and_truncated_responses(self):
+        def truncated(prompt):
+            text = json.dumps(verdicts_for(prompt))
+            return 200, text[: text.rindex("certainity")]
+
+        def fenced(prompt):
+            return 200, f"```json\n{json.dumps(verdicts_for(prompt))}\n```"
+
+        with FakeGemini(fenced) as gemini:
+            self.assertVerdicts(gemini.checker().check(STATEMENTS[:3]), [0, 0.1, 0.2])
+        # The verdicts that arrived whole are kept and the cut off one dropped.
+        with FakeGemini(truncated) as gemini:
+            self.assertVerdicts(gemini.checker().check(STATEMENTS[:3]), [0, 0.1, None])
+        self.assertEqual(len(gemini.prompts), 1)
+
+    def test_malformed_responses_are_retried(self):
+        with FakeGemini(replies=[(200, "I can't help with that."), (200, "[{}]")]) as gemini:
+            self.assertVerdicts(gemini.checker().check(STATEMENTS[:2]), [0, 0.1])
+        self.assertEqual(len(gemini.prompts), 3)
+
+        with FakeGemini(lambda prompt: (200, '{"index": 0}')) as gemini:
+            self.assertVerdicts(gemini.checker().check(STATEMENTS[:2]), [None, None])
+        self.assertEqual(len(gemini.prompts), 3)
+
+    def test_rate_limits_and_server_errors_are_retried(self):
+        for reply in (
+            error(429, "RESOURCE_EXHAUSTED"),
+            error(500, "INTERNAL"),
+            error(503, "UNAVAILABLE"),
+        ):
+            with self.subTest(status=reply[0]), FakeGemini(replies=[reply, reply]) as gemini:
+                self.assertVerdicts(gemini.checker().check(STATEMENTS[:2]), [0, 0.1])
+                self.assertEqual(len(gemini.prompts), 3)
+
+    def test_gives_up_after_max_retries(self):
+        with FakeGemini(lambda prompt: error(503, "UNAVAILABLE")) as gemini:
+            self.assertVerdicts(gemini.checker(max_retries=1).check(STATEMENTS[:2]), [None, None])
+        self.assertEqual(len(gemini.prompts), 2)
+
+    def test_client_errors_are_not_retried(self):
+        with FakeGemini(lambda prompt: error(400, "INVALID_ARGUMENT")) as gemini:
+            self.assertVerdicts(gemini.checker().check(STATEMENTS[:2]), [None, None])
+        self.assertEqual(len(gemini.prompts), 1)
+
+    def test_requests_are_rate_limited(self):
+        # 20 requests a second with a burst of 2: 6 batches take at least 0.2s.
+        with FakeGemini() as gemini:
+            checker = gemini.checker(batch_size=1, requests_per_minute=1200, burst=2)
+            checker.client  # Built up front so it doesn't count against the bucket.
+            checker.bucket.updated = time.monotonic()
+            checker.check(STATEMENTS[:6])
+        times = sorted(gemini.times)
+        self.assertGreaterEqual(times[-1] - times[0], 0.18)
+        self.assertLess(times[1] - times[0], 0.05)
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=50, capacity=3)
+        start = time.monotonic()
+        for _ in range(3):
+            bucket.acquire()
+        self.assertLess(time.monotonic() - start, 0.02)
+        for _ in range(5):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+
+class ClaimHashTests(SimpleTestCase):
+    def test_equivalent_claims_share_a_hash(self):
+        claim = "Vaccines cause autism."
+        for variant in (
+            "vaccines cause autism",
+            "  VACCINES   cause\tautism!!",
+            "\uff36accines cause autism",  # fullwidth V, folded by NFKC
+            "Vaccines, cause autism?",
+        ):
+            with self.subTest(variant=variant):
+                self.assertEqual(claim_hash(variant), claim_hash(claim))
+        self.assertEqual(normalize_claim(claim), "vaccines cause autism")
+
+    def test_different_claims_differ(self):
+        self.assertNotEqual(
+            claim_hash("Vaccines cause autism"), claim_hash("Vaccines don't cause autism")
+        )
+
+
+class LexiconScorerTests(SimpleTestCase):
+    sentences = [
+        "This is a good idea.",
+        "This is not a good idea.",
+        "It was never really bad.",
+        "No honest person would say that.",
+        "The food is very good but the service is extremely slow.",
+        "They're really not happy about it.",
+        "I don't think it's a great plan.",
+        "She isn't very happy, and he won't be either.",
+        "We'd love it if you'd come, it's wonderful!",
+        "The U.S. economy is doing terribly, e.g. prices are insanely high.",
+        "Dr. Smith said the results were absolutely amazing...",
+        "The meeting is on Tuesday at 3 p.m.",
+        "\u201cIt\u2019s the best,\u201d he said \u2014 truly incredible!",
+        "",
+    ]
+
+    def test_matches_textblob(self):
+        np.testing.assert_allclose(
+            LexiconScorer().score(self.sentences),
+            TextBlobScorer().score(self.sentences),
+            atol=1e-6,
+        )
+
+
+class PayloadCacheTests(TestCase):
+    url = "https://www.tiktok.com/@someone/video/1"
+
+    def setUp(self):
+        cache = LocMemCache("payload-cache-tests", {"TIMEOUT": 60})
+        patcher = mock.patch.object(payload_cache, "cache", cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(cache.clear)
+        self.media = BiasedMedia.objects.create(name="video", url=self.url, complete=True)
+
+    def score(self, bias: float) -> None:
+        BiasedMedia.objects.filter(pk=self.media.pk).update(bias_mean=bias)
+        payload_cache.invalidate([self.url])
+
+    def test_cached_until_invalidated(self):
+        self.assertEqual(payload_cache.get_completed(self.url)["average_bias"], 0)
+        with self.assertNumQueries(0):
+            entry = payload_cache.get_completed(self.url)
+        self.assertEqual(async_to_sync(payload_cache.aget)(self.url), entry)
+
+        self.score(0.5)
+        self.assertIsNone(async_to_sync(payload_cache.aget)(self.url))
+        self.assertEqual(payload_cache.get_completed(self.url)["average_bias"], 0.5)
+
+    def test_payload_built_before_an_invalidation_is_not_cached(self):
+        build = payload_cache.build
+
+        def build_then_rescore(media):
+            entry = build(media)
+            # The scores change (and are invalidated) after the rows were read.
+            self.score(0.5)
+            return entry
+
+        for cached_before in (False, True):
+            with self.subTest(cached_before=cached_before):
+                if cached_before:
+                    payload_cache.get_completed(self.url)
+                    self.score(0.25)
+                with mock.patch.object(payload_cache, "build", build_then_rescore):
+                    payload_cache.get_completed(self.url)
+                self.assertEqual(payload_cache.get_completed(self.url)["average_bias"], 0.5)
+
+
+def level(db: float) -> float:
+    return 10 ** (db / 20)
+
+
+def talking(seconds: float, db: float, rng: np.random.Generator) -> np.ndarray:
+    """Speech-like bursts of noise: syllables and short pauses between phrases."""
+    length = int(seconds * SAMPLE_RATE)
+    parts: list[np.ndarray] = []
+    while sum(map(len, parts)) < length:
+        for _ in range(rng.integers(5, 15)):
+            syllable = int(rng.uniform(0.12, 0.3) * SAMPLE_RATE)
+            loudness = rng.uniform(0.5, 1.5)
+            parts.append(rng.normal(0, loudness, syllable) * np.hanning(syllable) ** 0.5)
+            parts.append(np.zeros(int(0.03 * SAMPLE_RATE)))
+        parts.append(np.zeros(int(rng.uniform(0.2, 0.5) * SAMPLE_RATE)))
+    speech = np.concatenate(parts)[:length]
+    return speech / np.sqrt(np.mean(np.square(speech[speech != 0]))) * level(db)
+
+
+def music(seconds: float, db: float) -> np.ndarray:
+    """Held chords of notes with overtones, changing every half second."""
+    rng = np.random.default_rng(1)
+    notes = np.array([110, 131, 147, 165, 196, 220, 262, 294, 330, 392, 440, 523, 587])
+    t = np.arange(int(0.5 * SAMPLE_RATE)) / SAMPLE_RATE
+    chords = [
+        sum(
+            np.sin(2 * np.pi * f * k * t) / k
+            for f in rng.choice(notes, 4, replace=False)
+            for k in range(1, 6)
+        )
+        for _ in range(int(np.ceil(seconds / 0.5)))
+    ]
+    song = np.concatenate(chords)[: int(seconds * SAMPLE_RATE)]
+    return song / np.sqrt(np.mean(np.square(song))) * level(db)
+
+
+def room_tone(seconds: float, db: float, rng: np.random.Generator) -> np.ndarray:
+    return rng.normal(0, level(db), int(seconds * SAMPLE_RATE))
+
+
+def kept(regions: list[tuple[int, int]]) -> float:
+    return sum(end - start for start, end in regions) / SAMPLE_RATE
+
+
+class SpeechRegionsTests(SimpleTestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+
+    def regions(self, audio: np.ndarray, **options) -> list[tuple[int, int]]:
+        return speech_regions(audio.astype(np.float32), **options)
+
+    def test_speech_over_music_is_kept(self):
+        for bed_db in (-26, -32):
+            with self.subTest(bed_db=bed_db):
+                audio = talking(53, -20, self.rng) + music(53, bed_db)
+                self.assertEqual(self.regions(audio), [(0, len(audio))])
+
+    def test_continuous_speech_is_kept(self):
+        audio = talking(53, -20, self.rng) + room_tone(53, -70, self.rng)
+        self.assertEqual(self.regions(audio), [(0, len(audio))])
+
+    def test_silences_are_cut(self):
+        parts = [room_tone(8, -75, self.rng)]
+        for _ in range(3):
+            parts += [talking(5, -20, self.rng), room_tone(10, -75, self.rng)]
+        audio = np.concatenate(parts)
+        regions = self.regions(audio)
+        self.assertEqual(len(regions), 3)
+        for (start, end), speech_start in zip(regions, (8, 23, 38)):
+            self.assertLessEqual(start, speech_start * SAMPLE_RATE)
+            self.assertGreaterEqual(end, (speech_start + 4.9) * SAMPLE_RATE)
+        self.assertLess(kept(regions), 18)
+
+    def test_music_without_speech_is_dropped(self):
+        for music_db in (-20, -30, -40):
+            with self.subTest(music_db=music_db):
+                audio = music(30, music_db) + room_tone(30, -70, self.rng)
+                self.assertEqual(self.regions(audio), [])
+
+    def test_speech_after_a_music_intro(self):
+        audio = music(40, -24) + room_tone(40, -70, self.rng)
+        audio[20 * SAMPLE_RATE :] += talking(20, -20, self.rng)
+        [(start, end)] = self.regions(audio)
+        self.assertGreater(start, 18 * SAMPLE_RATE)
+        self.assertLessEqual(start, 20 * SAMPLE_RATE)
+        self.assertEqual(end, len(audio))
+
+    def test_a_short_utterance_is_all_that_is_transcribed(self):
+        speech = talking(2, -20, self.rng)
+        audio = room_tone(121, -75, self.rng)
+        audio[59 * SAMPLE_RATE : 61 * SAMPLE_RATE] += speech
+        [(start, end)] = self.regions(audio)
+        self.assertLessEqual(start, 59 * SAMPLE_RATE)
+        self.assertGreaterEqual(end, 59 * SAMPLE_RATE + np.flatnonzero(speech)[-1])
+        self.assertLess(kept([(start, end)]), 3)
+
+    def test_silent_track_has_no_speech(self):
+        self.assertEqual(self.regions(room_tone(20, -75, self.rng)), [])
+
+
+class FakeTranscriber:
+    """Answers every chunk with one segment spanning all of it."""
+
+    def __init__(self):
+        self.chunks: list[int] = []
+
+    def transcribe(self, audio: np.ndarray):
+        self.chunks.append(len(audio))
+        yield {"start": 0.0, "end": len(audio) / SAMPLE_RATE, "text": "words"}
+
+
+class TranscribeAudioTests(SimpleTestCase):
+    def test_joined_regions_map_back_to_the_track(self):
+        second = SAMPLE_RATE
+        regions = [(2 * second, 5 * second), (9 * second, 10 * second)]
+        joined = JoinedRegions(np.zeros(20 * second), regions)
+        self.assertEqual(len(joined.audio), 4 * second)
+        self.assertEqual(joined.track_time(0), 2)
+        self.assertEqual(joined.track_time(1.5), 3.5)
+        self.assertEqual(joined.track_time(3), 9)
+        self.assertEqual(joined.track_time(3, end=True), 5)
+        self.assertEqual(joined.track_time(4, end=True), 10)
+
+    @override_settings(ANALYSIS_STREAMING=True, TRANSCRIBE_CHUNK_SECONDS=30)
+    def test_speech_regions_are_transcribed_together(self):
+        rng = np.random.default_rng(0)
+        parts = [room_tone(8, -75, rng)]
+        for _ in range(3):
+            parts += [talking(5, -20, rng), room_tone(10, -75, rng)]
+        audio = np.concatenate(parts).astype(np.float32)
+        regions = speech_regions(audio)
+
+        model = FakeTranscriber()
+        with (
+            mock.patch.object(pipeline, "decode_audio", return_value=audio),
+            mock.patch.object(pipeline.model_registry, "get_audio_model", return_value=model),
+        ):
+            segments = pipeline.transcribe_audio("video.mp4")
+        self.assertEqual(model.chunks, [sum(end - start for start, end in regions)])
+        self.assertEqual(len(segments), 1)
+        self.assertAlmostEqual(segments[0]["start"], regions[0][0] / SAMPLE_RATE)
+        self.assertAlmostEqual(segments[0]["end"], regions[-1][1] / SAMPLE_RATE)
+
+
+@override_settings(
+    CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "analysis": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    }
+)
+class AnalyzeMediaTests(TestCase):
+    url = "https://www.tiktok.com/@someone/video/1"
+
+    def setUp(self):
+        caches["default"].clear()
+        patcher = mock.patch.object(payload_cache, "cache", caches["analysis"])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for name in ("enqueue", "promote", "remove"):
+            patcher = mock.patch.object(scheduler, name)
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+        self.enqueue.return_value = 1
+        self.promote.return_value = None
+        patcher = mock.patch.object(tasks, "_submit")
+        self.submit = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def submitted(self) -> tuple[dict, int]:
+        (job, job_priority), _ = self.submit.call_args
+        return job, job_priority
+
+    def test_interactive_request_promotes_a_waiting_job(self):
+        waiting = tasks.analyze_media(self.url, "video", priority="prefetch")
+        job, job_priority = self.submitted()
+        self.assertEqual((job["task_id"], job_priority), (waiting, scheduler.priority("prefetch")))
+
+        self.promote.return_value = self.url
+        promoted = tasks.analyze_media(self.url + "?lang=en", "video")
+        self.assertNotEqual(promoted, waiting)
+        self.promote.assert_called_once_with(job["key"], scheduler.priority("interactive"))
+        self.assertEqual(jobs.current(job["key"]), promoted)
+        self.assertEqual(
+            self.submitted(),
+            ({**job, "task_id": promoted}, scheduler.priority("interactive")),
+        )
+
+    def test_other_url_forms_share_the_media(self):
+        tasks.analyze_media(self.url, "video")
+        job, _ = self.submitted()
+        forms = [self.url + "?lang=en", "https://www.tiktok.com/embed/v2/1"]
+        self.assertEqual(BiasedMedia.objects.for_url(forms[0]).get().pk, job["media_id"])
+
+        BiasedMedia.objects.filter(pk=job["media_id"]).update(complete=True)
+        jobs.release(job["key"])
+        with (
+            mock.patch.object(tasks.notify, "publish"),
+            mock.patch.object(scheduler, "waiting", return_value=0),
+        ):
+            for url in forms:
+                self.assertIsNone(tasks.analyze_media(url, "video"))
+                self.assertIsNotNone(payload_cache.get_completed(url))
+            outcome = tasks.prefetch_media([forms[0]])
+        self.assertEqual(outcome["known"], [forms[0]])
+        self.assertEqual(self.submit.call_count, 1)
+        self.assertEqual(BiasedMedia.objects.count(), 1)
+
+    def test_running_job_is_left_alone(self):
+        running = tasks.analyze_media(self.url, "video", priority="prefetch")
+        self.assertEqual(tasks.analyze_media(self.url, "video"), running)
+        self.assertEqual(self.submit.call_count, 1)
+
+    def test_superseded_message_is_dropped(self):
+        tasks.analyze_media(self.url, "video", priority="prefetch")
+        old, _ = self.submitted()
+        self.promote.return_value = self.url
+        tasks.analyze_media(self.url, "video")
+        new, _ = self.submitted()
+
+        fetched = mock.Mock(video_id="1", uploader=None)
+        with (
+            mock.patch.object(tasks.media_cache, "fetch", return_value=fetched) as fetch,
+            mock.patch.object(tasks.notify, "publish"),
+        ):
+            with self.assertRaises(Ignore):
+                tasks.fetch_media(dict(old))
+            fetch.assert_not_called()
+            self.remove.assert_not_called()
+
+            self.assertEqual(tasks.fetch_media(dict(new))["video_id"], "1")
+            self.remove.assert_called_once_with(new["key"])
+
+            # The promoted job finishes before the old message comes up.
+            BiasedMedia.objects.filter(pk=new["media_id"]).update(complete=True)
+            jobs.release(new["key"])
+            with self.assertRaises(Ignore):
+                tasks.fetch_media(dict(old))
+            fetch.assert_called_once()
+
+    def test_message_outliving_its_claim_reclaims_the_job(self):
+        tasks.analyze_media(self.url, "video")
+        job, _ = self.submitted()
+        jobs.release(job["key"])
+
+        fetched = mock.Mock(video_id="1", uploader=None)
+        with (
+            mock.patch.object(tasks.media_cache, "fetch", return_value=fetched),
+            mock.patch.object(tasks.notify, "publish"),
+        ):
+            self.assertEqual(tasks.fetch_media(dict(job))["video_id"], "1")
+        self.assertEqual(jobs.current(job["key"]), job["task_id"])
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class FactCheckViewTests(TestCase):
+    url = "https://www.tiktok.com/@someone/video/1"
+
+    def setUp(self):
+        caches["default"].clear()
+        patcher = mock.patch.object(tasks.fact_check_media, "apply_async")
+        self.apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def media(self, complete: bool = True) -> BiasedMedia:
+        return BiasedMedia.objects.create(name="video", url=self.url, complete=complete)
+
+    def start(self, url: str | None = None):
+        return self.client.post(f"/analysis/{url or self.url}")
+
+    def test_unknown_media_is_not_found(self):
+        self.assertEqual(self.start().status_code, 404)
+        self.apply_async.assert_not_called()
+
+    def test_media_still_being_analyzed_conflicts(self):
+        self.media(complete=False)
+        self.assertEqual(self.start().status_code, 409)
+        self.apply_async.assert_not_called()
+
+    def test_fact_check_is_queued_once(self):
+        media = self.media()
+        response = self.start()
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["job_id"]
+        self.assertEqual(response["Location"], f"/analysis/jobs/{job_id}")
+        self.apply_async.assert_called_once_with((media.pk,), task_id=job_id)
+
+        again = self.start(self.url + "?lang=en")
+        self.assertEqual(again.json()["job_id"], job_id)
+        self.assertEqual(self.apply_async.call_count, 1)
+
+    def status(self, job_id: str, state: str = "PENDING", result=None):
+        # What Celery's result backend reports for the job.
+        async_result = mock.Mock(state=state, result=result)
+        async_result.successful.return_value = state == "SUCCESS"
+        async_result.failed.return_value = state == "FAILURE"
+        with mock.patch("credibly.apps.api.views.AsyncResult", return_value=async_result):
+            return self.client.get(f"/analysis/jobs/{job_id}")
+
+    def test_status_of_queued_unknown_and_finished_jobs(self):
+        self.media()
+        job_id = self.start().json()["job_id"]
+        response = self.status(job_id)
+        self.assertEqual((response.status_code, response.json()), (202, {"status": "pending"}))
+        self.assertEqual(self.status("not-a-job").status_code, 404)
+
+        response = self.status(job_id, "SUCCESS", {"url": self.url})
+        self.assertEqual(response.json(), {"status": "complete", "url": self.url})
+        self.assertEqual(self.status(job_id, "FAILURE", ValueError("no")).status_code, 500)
+
+    def test_verdicts_are_pushed_as_they_arrive(self):
+        media = self.media()
+        content = BiasedContent.objects.create(
+            media=media, content="The moon is cheese", bias_strength=0.8
+        )
+
+        def check(contents, on_checked):
+            for checked in contents:
+                checked.accuracy, checked.accuracy_certainty = 0.1, 0.9
+            on_checked(contents)
+            return contents
+
+        with (
+            mock.patch.object(factcheck, "fact_check_contents", check),
+            mock.patch.object(tasks.notify, "publish") as publish,
+        ):
+            tasks.fact_check_media(media.pk)
+        events = [(call.args[1], call.args[2]) for call in publish.call_args_list]
+        self.assertEqual(
+            events[0],
+            (
+                "verdict",
+                {
+                    "url": self.url,
+                    "content": content.content,
+                    "accuracy": 0.1,
+                    "accuracy_certainty": 0.9,
+                    "bias_strength": 0.8,
+                },
+            ),
+        )
+        self.assertEqual(events[-1][0], "fact_check_complete")
+        self.assertIsNone(jobs.current(tasks._fact_check_key(self.url)))
+
+
+class PrefetchViewTests(SimpleTestCase):
+    def test_rejects_bodies_without_a_list_of_urls(self):
+        url = "https://www.tiktok.com/@someone/video/1"
+        for body in ([url], {"urls": url}, {}):
+            with self.subTest(body=body):
+                response = self.client.post(
+                    "/analysis/prefetch", body, content_type="application/json"
+                )
+                self.assertEqual(response.status_code, 400)
+
+
+def redis_available() -> bool:
+    try:
+        return redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=1).ping()
+    except redis.RedisError:
+        return False
+
+
+# Published from a separate process, as a Celery worker would.
+PUBLISH_SCRIPT = """
+import sys
+import django
+
+django.setup()
+from credibly.apps.api import notify
+
+url = sys.argv[1]
+notify.publish(url, "verdict", {"url": url, "content": "claim", "accuracy": 0.2})
+notify.publish(url, "fact_check_complete", {"url": url, "average_misinformation": 0.8})
+"""
+
+
+@skipUnless(redis_available(), "Redis is not available")
+class RedisIntegrationTests(SimpleTestCase):
+    def publish_from_another_process(self, url: str) -> None:
+        subprocess.run(
+            [sys.executable, "-c", PUBLISH_SCRIPT, url],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": "credibly.settings"},
+            check=True,
+            timeout=60,
+        )
+
+    def test_published_events_reach_the_listening_room(self):
+        from . import server
+
+        url = f"https://www.tiktok.com/@someone/video/{uuid.uuid4().int % 10**19}"
+        emitted = []
+
+        async def emit(event, data, room=None, ignore_queue=False):
+            emitted.append((event, data, room))
+
+        async def relay():
+            await server.listen_for_results(url, "fact_check")
+            listener = server._listeners[url, "fact_check"]
+            await asyncio.to_thread(self.publish_from_another_process, url)
+            await asyncio.wait_for(listener, 10)
+
+        with mock.patch.object(server.sio, "emit", emit):
+            async_to_sync(relay)()
+        self.assertEqual(
+            emitted,
+            [
+                ("factCheckVerdict", {"url": url, "content": "claim", "accuracy": 0.2}, url),
+                ("factCheckComplete", {"average_misinformation": 0.8, "url": url}, url),
+            ],
+        )
+
+    def test_emits_fan_out_to_clients_of_other_servers(self):
+        channel = f"test-socketio-{uuid.uuid4().hex}"
+        sender, receiver = (
+            socketio.AsyncServer(
+                async_mode="asgi",
+                client_manager=socketio.AsyncRedisManager(
+                    settings.SOCKETIO_REDIS_URL, channel=channel
+                ),
+            )
+            for _ in range(2)
+        )
+
+        async def fan_out():
+            received = asyncio.Queue()
+            receiver._send_eio_packet = mock.AsyncMock(
+                side_effect=lambda eio_sid, packet: received.put_nowait((eio_sid, packet))
+            )
+            for server in (sender, receiver):
+                server.manager_initialized = True
+                server.manager.initialize()
+            sid = await receiver.manager.connect("client", "/")
+            await receiver.manager.enter_room(sid, "/", "room")
+            try:
+                # The receiver subscribes in the background, so emit until
+                # the first message gets through.
+                for _ in range(25):
+                    await sender.emit("credibilityUpdate", {"bias_strength": 0.4}, room="room")
+                    try:
+                        return await asyncio.wait_for(received.get(), 0.2)
+                    except TimeoutError:
+                        continue
+                self.fail("The other server's client never received the event")
+            finally:
+                for server in (sender, receiver):
+                    server.manager.thread.cancel()
+
+        eio_sid, packet = async_to_sync(fan_out)()
+        self.assertEqual(eio_sid, "client")
+        self.assertEqual(
+            socketio.packet.Packet(encoded_packet=packet.data).data,
+            ["credibilityUpdate", {"bias_strength": 0.4}],
+        )
 
-# Create your tests here.
@@ -3,6 +3,14 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
+    path(
+        "analysis/jobs/<str:job_id>",
+        views.fact_check_status,
+        name="fact-check-status",
+    ),
+    path("analysis/prefetch", views.prefetch_videos),
     path("analysis/<path:url>", views.start_analysis_of_statements),
     path("credibility/<path:url>", views.credibility_view),
+    path("creators/", views.good_content_creators),
+    path("video/", views.get_video),
 ]
@@ -0,0 +1,113 @@
+"""A single writer thread for the process's database writes.
+
+SQLite lets only one connection write at a time, so threads that each open
+their own write transaction mostly end up waiting on one another (or failing
+with "database is locked"). Instead, writes are handed to one thread that
+drains the queue and runs everything waiting in a single transaction, so a
+burst of small writes from many threads costs one commit. Each write runs in
+its own savepoint, so one failing write doesn't undo the others it shares a
+transaction with.
+
+Configured by ``settings.DATABASE_WRITER``; with it disabled, writes simply
+run in the calling thread.
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from typing import Any
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_queue: queue.SimpleQueue[tuple[Future, Callable, tuple, dict]] = queue.SimpleQueue()
+_thread: threading.Thread | None = None
+_thread_lock = threading.Lock()
+
+
+def _options() -> dict:
+    return settings.DATABASE_WRITER
+
+
+def _start() -> None:
+    global _thread
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_run, name="db-writer", daemon=True)
+            _thread.start()
+
+
+def _take_batch() -> list[tuple[Future, Callable, tuple, dict]]:
+    options = _options()
+    batch = [_queue.get()]
+    deadline = time.monotonic() + options["max_delay"]
+    while len(batch) < options["max_batch"]:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(_queue.get(timeout=timeout))
+        except queue.Empty:
+            break
+    return batch
+
+
+def _write(batch: list[tuple[Future, Callable, tuple, dict]]) -> None:
+    results: list[tuple[Future, Any, BaseException | None]] = []
+    with transaction.atomic():
+        for future, func, args, kwargs in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                with transaction.atomic():
+                    results.append((future, func(*args, **kwargs), None))
+            except Exception as exc:
+                results.append((future, None, exc))
+    # Only report success once the batch has actually been committed.
+    for future, result, exc in results:
+        if exc is None:
+            future.set_result(result)
+        else:
+            future.set_exception(exc)
+
+
+def _run() -> None:
+    while True:
+        batch = _take_batch()
+        close_old_connections()
+        try:
+            _write(batch)
+        except Exception as exc:
+            logger.exception("Database write batch of %d failed", len(batch))
+            for future, *_ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+        finally:
+            close_old_connections()
+
+
+def submit(func: Callable, *args, **kwargs) -> Future:
+    """Queue ``func(*args, **kwargs)`` to run on the writer thread."""
+    future: Future = Future()
+    if not _options()["enabled"] or connection.in_atomic_block:
+        # A caller already inside a transaction holds (or is about to take)
+        # the write lock itself, so the writer thread would only wait on it.
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(func(*args, **kwargs))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+    _start()
+    _queue.put((future, func, args, kwargs))
+    return future
+
+
+def run(func: Callable, *args, **kwargs) -> Any:
+    """Run ``func`` on the writer thread and wait for it to be committed."""
+    return submit(func, *args, **kwargs).result()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -88,6 +89,21 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            # WAL lets readers carry on while a write is in progress, and with
+            # it synchronous=NORMAL is still safe against corruption.
+            "init_command": (
+                "PRAGMA journal_mode=WAL;"
+                "PRAGMA synchronous=NORMAL;"
+                "PRAGMA temp_store=MEMORY;"
+                "PRAGMA mmap_size=134217728;"
+            ),
+            # Take the write lock when a transaction starts, so two writers
+            # queue up on the busy timeout instead of one of them failing
+            # with "database is locked" when it tries to upgrade its lock.
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+        },
     }
 }
 
@@ -139,14 +155,221 @@ AUTH_USER_MODEL = "users.User"
 
 ASGI_APPLICATION = "credibly.asgi.application"
 
-# Channel layer settings
+# Redis server shared by Celery, the channel layer and Socket.IO. Each gets its
+# own database number below.
+REDIS_URL = os.environ.get("REDIS_URL", "redis://127.0.0.1:6379").rstrip("/")
+
+# Channel layer settings. The layer is how Celery tasks reach clients (see
+# credibly.apps.api.notify), so it has to be shared by every process: a
+# client connected to one ASGI process gets results computed anywhere.
 CHANNEL_LAYERS = {
     "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",
+        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "CONFIG": {
+            "hosts": [f"{REDIS_URL}/2"],
+        },
     },
 }
 
+# Socket.IO rooms are kept in Redis too, so the web tier can run several
+# processes behind a load balancer. The balancer must pin each client to one
+# process (sticky sessions) for Socket.IO's long-polling transport to work.
+SOCKETIO_REDIS_URL = f"{REDIS_URL}/3"
 
-CELERY_BROKER_URL = "redis://127.0.0.1:6379/0"
+
+CELERY_BROKER_URL = f"{REDIS_URL}/0"
+# Needed to join the transcription and OCR branches of the pipeline.
+CELERY_RESULT_BACKEND = f"{REDIS_URL}/1"
+# Also how long the fact-check status endpoint knows a job id for.
+CELERY_RESULT_EXPIRES = 24 * 60 * 60
 CELERY_LOG_LEVEL = "WARNING"
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
+
+# Admission control (see credibly.apps.api.scheduler). Each worker node runs
+# at most ANALYSIS_WORKER_CONCURRENCY pipeline tasks and only takes a task
+# when it has a free slot, leaving the rest in the broker, which hands them
+# out by priority.
+CELERY_WORKER_CONCURRENCY = int(os.environ.get("ANALYSIS_WORKER_CONCURRENCY", 2))
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_ACKS_LATE = True
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    "priority_steps": list(range(10)),
+    "sep": ":",
+    "queue_order_strategy": "priority",
+    # Tasks are acknowledged when they finish, so this has to outlast the
+    # longest analysis or it is handed to a second worker.
+    "visibility_timeout": 2 * 60 * 60,
+}
+# Priorities of the kinds of analysis (0 runs first, 9 last), Redis used to
+# track queue positions, and how many waiting jobs are told their position
+# each time the queue moves. A prefetch request may name up to
+# "prefetch_limit" videos, and is ignored while more than
+# "prefetch_max_waiting" jobs are already waiting.
+ANALYSIS_QUEUE = {
+    "priorities": {"interactive": 1, "prefetch": 6, "rescore": 9},
+    "redis_url": f"{REDIS_URL}/6",
+    "announce_limit": 200,
+    "prefetch_limit": 20,
+    "prefetch_max_waiting": 50,
+}
+
+
+# Inference models, loaded lazily and shared per process by
+# credibly.apps.api.model_registry. "threads" sets the model's CPU thread
+# count; leave it as None to use the library's default. The sentence scorer's
+# "backend" is "lexicon" (vectorized) or "textblob" (see
+# credibly.apps.api.scoring).
+#
+# Speech recognition (see credibly.apps.api.asr) can be tuned per worker from
+# the environment: ASR_BACKEND is "whisper" or "faster-whisper", ASR_MODEL the
+# model size, ASR_COMPUTE_TYPE faster-whisper's quantization ("int8",
+# "int8_float32", "float32", ...) and ASR_THREADS the thread count.
+INFERENCE_MODELS = {
+    "asr": {
+        "backend": os.environ.get("ASR_BACKEND", "whisper"),
+        "size": os.environ.get("ASR_MODEL", "tiny"),
+        "device": "cpu",
+        "compute_type": os.environ.get("ASR_COMPUTE_TYPE", "int8"),
+        "threads": int(os.environ.get("ASR_THREADS", 0)) or None,
+    },
+    "easyocr": {"languages": ["en"], "device": "cpu", "threads": None},
+    "scorer": {"backend": "lexicon"},
+}
+# Start loading the models in a background thread as soon as a Celery worker
+# process starts, instead of on the first job it runs.
+INFERENCE_WARMUP = True
+
+# How long (in seconds) an analysis may run before another request for the
+# same video is allowed to start a fresh one.
+ANALYSIS_JOB_TIMEOUT = 30 * 60
+
+# Score and publish transcript segments and on-screen text as they are
+# produced instead of only once the whole video has been processed.
+ANALYSIS_STREAMING = True
+# Length of the audio chunks transcribed at a time in streaming mode. Whisper
+# works on 30 second windows, so smaller chunks only cost accuracy.
+TRANSCRIBE_CHUNK_SECONDS = 30
+
+# Voice activity detection before transcription (see
+# credibly.apps.api.audio.speech_regions). Frames of "frame_ms" count as
+# speech when they are louder than "min_level_db", and also "noise_margin_db"
+# above the track's noise floor if that floor is quieter than
+# "quiet_floor_db" (so music beds and nonstop talking are kept whole), and
+# when their level varies by at least "min_modulation_db" over the
+# "modulation_ms" around them, as syllables do and held music doesn't.
+# Runs shorter than "min_speech_ms" are dropped, the rest padded by
+# "padding_ms" and merged across gaps under "max_gap_ms".
+VOICE_ACTIVITY = {
+    "enabled": True,
+    "frame_ms": 30,
+    "min_level_db": -45.0,
+    "quiet_floor_db": -50.0,
+    "noise_margin_db": 6.0,
+    "modulation_ms": 1000,
+    "min_modulation_db": 1.5,
+    "min_speech_ms": 250,
+    "padding_ms": 300,
+    "max_gap_ms": 1500,
+}
+
+# Frame selection before OCR (see credibly.apps.api.frames). Frames are taken
+# every "interval" seconds and only OCR'd if the lines of text in them differ
+# from the last OCR'd frame by more than "text_change" (one minus their
+# correlation, allowing for small shifts), or if their perceptual hash
+# differs by more than "hash_distance" bits and the scene changed (histogram
+# correlation below "scene_threshold").
+KEYFRAME_SAMPLING = {
+    "interval": 0.5,
+    "hash_distance": 12,
+    "scene_threshold": 0.9,
+    "text_change": 0.1,
+}
+
+# OCR execution (see credibly.apps.api.ocr). Frames are shrunk to "width"
+# pixels wide and read "batch_size" at a time. "processes" > 0 spreads batches
+# over that many OCR processes, which requires running the Celery worker with
+# --pool threads or --pool solo.
+OCR_SETTINGS = {
+    "processes": 0,
+    "batch_size": 8,
+    "width": 720,
+}
+
+# Downloaded media, keyed by video id (see credibly.apps.api.media_cache).
+# Audio is fetched as the best audio-only stream and video as the smallest
+# stream that is still readable for OCR.
+MEDIA_CACHE = {
+    "dir": BASE_DIR / "media-cache",
+    "max_bytes": 2 * 1024**3,
+    "audio_format": "bestaudio",
+    "video_format": "worstvideo[height>=360]/worst[height>=360]/worst",
+}
+
+# Database writes from the pipeline and fact-checking are run by one thread
+# per process (see credibly.apps.api.writer), which commits whatever is queued
+# together: up to "max_batch" writes, waiting at most "max_delay" seconds for
+# more to arrive after the first.
+DATABASE_WRITER = {
+    "enabled": True,
+    "max_batch": 64,
+    "max_delay": 0.02,
+}
+
+# Threads the Socket.IO server may use for blocking database and broker calls
+# that have no async equivalent.
+ASYNC_DB_THREADS = 4
+
+# Gemini fact-checking (see credibly.apps.api.factcheck). Statements are sent
+# "batch_size" per prompt with at most "max_concurrency" requests in flight and
+# "requests_per_minute" (bursting to "burst") overall. Set "base_url" to point
+# the client at a different endpoint, e.g. a local fake for testing.
+FACT_CHECK = {
+    "api_key": os.environ.get("GEMINI_API_KEY", ""),
+    "base_url": os.environ.get("GEMINI_BASE_URL") or None,
+    "model": "gemini-2.0-flash",
+    "batch_size": 10,
+    "max_concurrency": 4,
+    "requests_per_minute": 60,
+    "burst": 4,
+    "max_retries": 3,
+    "backoff": 1.0,
+    # How long (in seconds) a cached verdict for a claim stays valid.
+    "verdict_ttl": 30 * 24 * 60 * 60,
+}
+
+# The creator leaderboard is served from CreatorScore a page at a time, and
+# each page is cached for a short while.
+LEADERBOARD = {
+    "page_size": 50,
+    "cache_seconds": 60,
+}
+
+# The default cache holds the single-flight job claims and running scores
+# (see credibly.apps.api.jobs), which the web processes and Celery workers all
+# need to see, so it lives in Redis.
+#
+# Payloads of completed analyses are cached in the "analysis" cache (see
+# credibly.apps.api.payload_cache) and invalidated whenever their scores
+# change. Setting ANALYSIS_CACHE_URL to an empty string swaps it for a per
+# process local memory cache, which only keeps entries briefly in case another
+# process has changed the scores since.
+ANALYSIS_CACHE_URL = os.environ.get("ANALYSIS_CACHE_URL", f"{REDIS_URL}/5")
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": f"{REDIS_URL}/4",
+    },
+    "analysis": (
+        {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": ANALYSIS_CACHE_URL,
+            "TIMEOUT": 24 * 60 * 60,
+        }
+        if ANALYSIS_CACHE_URL
+        else {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "analysis",
+            "TIMEOUT": 60,
+        }
+    ),
+}